@@ -0,0 +1,87 @@
+"""Compares writing the import files with the dedicated formatter against DataFrame.to_csv.
+
+Run from the repository root, with the package installed (`poetry install`):
+
+    poetry run python benchmarks/import_file_formatting.py --rows 200000
+"""
+import argparse
+import io
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from journal_entries.api import generate_entries
+from journal_entries.constants import Department, Division, Market, e16
+from journal_entries.formatting import write_import_file
+from journal_entries.main import entries_by_entity, entries_to_dataframe
+
+EXAMPLE_STATEMENT = Path(__file__).parent.parent / 'tests' / 'data' / 'example-statement.xlsx'
+
+
+def to_csv_import_files(entries) -> dict[str, bytes]:
+    df = entries_to_dataframe(entries)
+    files = dict()
+    for entity in df['entry_entity'].unique():
+        buffer = io.BytesIO()
+        df[df['entry_entity'] == entity].drop('entry_entity', axis=1) \
+            .to_csv(buffer, sep='\t', index=False, header=False, date_format='%m%d%y', )
+        files[entity] = buffer.getvalue()
+    return files
+
+
+def formatter_import_files(entries) -> dict[str, bytes]:
+    files = dict()
+    for entity, entity_entries in entries_by_entity(entries).items():
+        buffer = io.BytesIO()
+        write_import_file(entries=entity_entries, destination=buffer)
+        files[entity] = buffer.getvalue()
+    return files
+
+
+def best_of(repeat: int, function, *args):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='The number of statement rows')
+    parser.add_argument('--repeat', type=int, default=3, help='The best of this many runs is reported')
+    args = parser.parse_args()
+
+    example = pd.read_excel(EXAMPLE_STATEMENT)
+    rows = pd.concat([example] * (args.rows // len(example) + 1), ignore_index=True).head(args.rows)
+    entries = generate_entries(
+        rows=rows,
+        client_code='P005',
+        deposit_entity=e16,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='benchmark',
+    ).entries
+    lines = sum(len(entry.lines) for entry in entries)
+
+    to_csv_seconds, to_csv_files = best_of(args.repeat, to_csv_import_files, entries)
+    formatter_seconds, formatter_files = best_of(args.repeat, formatter_import_files, entries)
+    assert formatter_files == to_csv_files, 'The formatter output differs from to_csv'
+
+    print(f'{lines:,} lines in {len(formatter_files)} import files, best of {args.repeat}')
+    print(f'DataFrame.to_csv: {to_csv_seconds:8.3f}s  {lines / to_csv_seconds:12,.0f} lines/s')
+    print(f'formatter:        {formatter_seconds:8.3f}s  {lines / formatter_seconds:12,.0f} lines/s')
+    print(f'speed up:         {to_csv_seconds / formatter_seconds:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Library interface for generating the journal entries of a statement already in memory.
+
+Nothing is read from or written to disk. The returned `ImportEntries` gives the entries as a DataFrame with
+`to_dataframe()`, as one import file buffer per entity with `to_buffers()`, or line by line with `iter_lines()`.
+"""
+from datetime import date
+
+from .constants import Department, Entity, Market
+from .main import ImportEntries, Statement
+from .readers import StatementRows
+
+
+def generate_entries(
+        rows: StatementRows,
+        client_code: str,
+        deposit_entity: Entity,
+        posting_date: date,
+        document_date: date,
+        payment_number: str,
+        applies_to_type: str,
+        department: Department,
+        market: Market,
+        state: str,
+        division: str,
+        statement_identifier: str,
+        summarize_by: list[str] | None = None,
+
+        # Only if versioning is required
+        import_input_version: str = 'V1',
+) -> ImportEntries:
+    """Generates the journal entries for the statement rows.
+
+    :param rows: The statement as a DataFrame, an Arrow table or an iterable of row dictionaries. The column names are
+        the same as the statement file's.
+    """
+    statement = Statement(
+        import_file=rows,
+        client_code=client_code,
+        deposit_entity=deposit_entity,
+        posting_date=posting_date,
+        document_date=document_date,
+        payment_number=payment_number,
+        applies_to_type=applies_to_type,
+        department=department,
+        market=market,
+        state=state,
+        division=division,
+        statement_identifier=statement_identifier,
+        summarize_by=summarize_by,
+    )
+    import_je = statement.to_import_entries(import_version=import_input_version)
+    import_je.create()
+    return import_je
@@ -0,0 +1,213 @@
+"""Resumable batch runs over many statements.
+
+Every statement's progress is appended to a checkpoint journal, a JSON lines file, as it is started, completed or
+failed. Completed statements also record their output directory and a checksum of its files. Running the batch again
+skips the statements whose output is still there and matches its checksum, removes the output the batch wrote for the
+rest and runs them again. Output the batch did not write is never removed. Statements can run concurrently, and the
+rate the import files are written can be capped so a batch does not saturate a shared file server: every chunk of an
+import file waits for its turn before it is written.
+"""
+import hashlib
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from attrs import asdict, define, field
+
+from .constants import ENTITIES, Department, Division, Market
+from .main import SAVE_LOCATION, Statement, save_import_jes
+
+STARTED = 'started'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+@define
+class CheckpointRecord:
+    """The state of a statement in the checkpoint journal"""
+    statement_identifier: str
+    state: str
+    output_path: str | None = None
+    checksum: str | None = None
+    error: str | None = None
+
+
+@define
+class CheckpointJournal:
+    """An append only journal of checkpoint records. The last record of a statement is its current state."""
+    path: Path
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def load(self) -> dict[str, CheckpointRecord]:
+        records = dict()
+        if not self.path.exists():
+            return records
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = CheckpointRecord(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue  # A record cut short when the batch died is ignored
+                records[record.statement_identifier] = record
+        return records
+
+    def record(self, record: CheckpointRecord) -> None:
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(asdict(record)) + '\n')
+            f.flush()
+
+
+@define
+class RateLimiter:
+    """Caps the average rate bytes are written at, across all the threads of the batch"""
+    max_bytes_per_second: float
+    _lock: threading.Lock = field(factory=threading.Lock)
+    _next_free: float = 0.0
+
+    def throttle(self, bytes_to_write: int) -> None:
+        """Waits for the turn of the next `bytes_to_write` bytes. The bytes written before them by any thread have to
+        fit in the rate first, so writes are held back before they happen and never after the last one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + bytes_to_write / self.max_bytes_per_second
+        time.sleep(start - now)
+
+
+@define
+class BatchResult:
+    completed: list[str] = field(factory=list)
+    skipped: list[str] = field(factory=list)
+    failed: dict[str, str] = field(factory=dict)
+
+
+def run_batch(
+        statements: list[Statement],
+        checkpoint_path: Path,
+        save_location: Path = SAVE_LOCATION,
+        max_workers: int = 1,
+        max_bytes_per_second: float | None = None,
+
+        # Only if versioning is required
+        import_input_version: str = 'V1',
+        import_output_version: str = 'V1',
+) -> BatchResult:
+    """Runs `main()` for every statement, resuming from the checkpoint journal.
+
+    A statement that fails is recorded and left for the next run, the rest of the batch carries on.
+    """
+    identifiers = [statement.statement_identifier for statement in statements]
+    duplicates = sorted({identifier for identifier in identifiers if identifiers.count(identifier) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate statement identifiers: {duplicates}")
+
+    journal = CheckpointJournal(path=checkpoint_path)
+    previous_records = journal.load()
+    rate_limiter = RateLimiter(max_bytes_per_second) if max_bytes_per_second else None
+    result = BatchResult()
+
+    def run(statement: Statement) -> None:
+        identifier = statement.statement_identifier
+        output_path = save_location / f'{identifier}'
+        previous = previous_records.get(identifier)
+
+        if previous is not None and previous.state == COMPLETED and output_path.exists() \
+                and output_checksum(output_path) == previous.checksum:
+            result.skipped.append(identifier)
+            return
+
+        if output_path.exists():
+            if not written_by_batch(previous, output_path=output_path):
+                error = f'The output {output_path} already exists and was not written by this batch'
+                journal.record(CheckpointRecord(statement_identifier=identifier, state=FAILED, error=error))
+                result.failed[identifier] = error
+                return
+            shutil.rmtree(output_path)
+
+        journal.record(CheckpointRecord(statement_identifier=identifier, state=STARTED, output_path=str(output_path)))
+        try:
+            import_je = statement.to_import_entries(import_version=import_input_version)
+            import_je.create()
+            save_import_jes(
+                entries=import_je,
+                save_location=save_location,
+                version=import_output_version,
+                throttle=rate_limiter.throttle if rate_limiter is not None else None,
+            )
+        except Exception as e:  # Any failure is recorded so the rest of the batch can carry on
+            shutil.rmtree(output_path, ignore_errors=True)
+            first_line = str(e).split('\n', 1)[0]
+            error = f'{type(e).__name__}: {first_line}'
+            journal.record(CheckpointRecord(
+                statement_identifier=identifier, state=FAILED, output_path=str(output_path), error=error,
+            ))
+            result.failed[identifier] = error
+            return
+
+        journal.record(CheckpointRecord(
+            statement_identifier=identifier,
+            state=COMPLETED,
+            output_path=str(output_path),
+            checksum=output_checksum(output_path),
+        ))
+        result.completed.append(identifier)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(run, statements))
+
+    return result
+
+
+def written_by_batch(record: CheckpointRecord | None, output_path: Path) -> bool:
+    """Whether the journal shows the batch created the output, so it can be removed before running again.
+
+    Only attempts that were started record the output path. A statement that failed because its output was already
+    there, and was not the batch's, has no output path, so its output is never removed.
+    """
+    return record is not None and record.output_path == str(output_path)
+
+
+def output_checksum(output_path: Path) -> str:
+    """SHA-256 of the names and contents of the files in the statement's output directory"""
+    checksum = hashlib.sha256()
+    for file_ in sorted(output_path.iterdir()):
+        checksum.update(file_.name.encode())
+        with open(file_, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def read_manifest(manifest_file: Path) -> list[Statement]:
+    """Reads the statements of a batch from a CSV manifest with one statement per row.
+
+    The columns are the `Statement` fields. The deposit entity is its code, like E16, the department and market are
+    their names, like retail, the division is its number and the dates are in ISO format. Relative statement paths
+    are from the manifest's folder.
+    """
+    df = pd.read_csv(manifest_file, dtype=str, keep_default_na=False)
+    statements = list()
+    for row in df.to_dict(orient='records'):
+        import_file = Path(row['import_file'])
+        if not import_file.is_absolute():
+            import_file = manifest_file.parent / import_file
+        statements.append(Statement(
+            import_file=import_file,
+            client_code=row['client_code'],
+            deposit_entity=ENTITIES[row['deposit_entity']],
+            posting_date=pd.Timestamp(row['posting_date']),
+            document_date=pd.Timestamp(row['document_date']),
+            payment_number=row['payment_number'],
+            applies_to_type=row['applies_to_type'],
+            department=Department[row['department']],
+            market=Market[row['market']],
+            state=row['state'],
+            division=Division(row['division']),
+            statement_identifier=row['statement_identifier'],
+        ))
+    return statements
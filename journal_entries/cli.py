@@ -9,7 +9,10 @@ from typing import Annotated
 import typer
 from typer import Typer
 
+from .batch import read_manifest, run_batch
 from .main import main, SAVE_LOCATION
+from .observability import NULL_HOOKS, Hooks, JsonLinesExporter, MultiHooks, PrometheusTextfileExporter
+from .validation import validate_statements
 from .constants import (
     Department, Market, ENTITIES, ALLOWED_INPUT_VERSIONS, ALLOWED_OUTPUT_VERSIONS
 )
@@ -35,20 +38,33 @@ def is_valid_market(value: str) -> str:
 
 
 def is_valid_input_version(value: str) -> str:
-    if value not in ALLOWED_INPUT_VERSIONS.keys():
+    if value not in ALLOWED_INPUT_VERSIONS:
         raise ValueError(f"Invalid input version {value}.")
     return value
 
 
 def is_valid_output_version(value: str) -> str:
-    if value not in ALLOWED_OUTPUT_VERSIONS.keys():
+    if value not in ALLOWED_OUTPUT_VERSIONS:
         raise ValueError(f"Invalid output version {value}.")
     return value
 
 
+def metrics_hooks(jsonl_path: Path | None, prometheus_path: Path | None) -> Hooks:
+    exporters = list()
+    if jsonl_path is not None:
+        exporters.append(JsonLinesExporter(path=jsonl_path))
+    if prometheus_path is not None:
+        exporters.append(PrometheusTextfileExporter(path=prometheus_path))
+    if not exporters:
+        return NULL_HOOKS
+    return exporters[0] if len(exporters) == 1 else MultiHooks(hooks=exporters)
+
+
 @app.command()
 def journal_entry(
-        import_file: Annotated[Path, typer.Option(help="The path to the statement file", prompt=True)],
+        import_file: Annotated[
+            Path, typer.Option(help="The path to the statement file (.xlsx, .csv, .tsv or .parquet)", prompt=True)
+        ],
         client_code: Annotated[str, typer.Option(help="The client/customer code", prompt=True)],
         deposit_entity: Annotated[str, typer.Option(callback=is_valid_entity, prompt=True)],
         posting_date: Annotated[datetime, typer.Option(help="The journal entry posting date", prompt=True)],
@@ -66,6 +82,12 @@ def journal_entry(
         division: Annotated[str, typer.Option(help="The division the statement is for", prompt=True)],
         statement_identifier: Annotated[str, typer.Option(help="The statement identifier", prompt=True)],
         save_location: Path = SAVE_LOCATION,
+        metrics_jsonl: Annotated[
+            Path | None, typer.Option(help="Append the stage timings and counts to this JSON lines file")
+        ] = None,
+        metrics_prometheus: Annotated[
+            Path | None, typer.Option(help="Write the stage timings and counts to this Prometheus textfile")
+        ] = None,
 
         # Only if versioning is required
         import_input_version: Annotated[str, typer.Option(callback=is_valid_input_version, prompt=True)] = 'V1',
@@ -89,6 +111,64 @@ def journal_entry(
         division=division,
         statement_identifier=statement_identifier,
         save_location=save_location,
+        hooks=metrics_hooks(jsonl_path=metrics_jsonl, prometheus_path=metrics_prometheus),
+        import_input_version=import_input_version,
+        import_output_version=import_output_version,
+    )
+
+
+@app.command()
+def validate(
+        import_files: Annotated[list[Path], typer.Argument(help="The paths to the statement files to check")],
+        workers: Annotated[int | None, typer.Option(help="The number of files checked in parallel")] = None,
+):
+    """
+    Check statements for problems without generating the journal entries.
+    """
+    issues = validate_statements(import_files=import_files, max_workers=workers)
+    for issue in issues:
+        typer.echo(str(issue))
+
+    files_with_issues = len({issue.file for issue in issues})
+    typer.echo(f"{len(issues)} issue(s) found in {files_with_issues} of {len(import_files)} statement(s).")
+    if issues:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def batch(
+        manifest_file: Annotated[Path, typer.Argument(help="The CSV manifest with one statement per row")],
+        checkpoint_file: Annotated[
+            Path, typer.Option(help="The checkpoint journal. Re-running with it resumes the batch")
+        ],
+        save_location: Path = SAVE_LOCATION,
+        workers: Annotated[int, typer.Option(help="The number of statements generated concurrently")] = 1,
+        max_bytes_per_second: Annotated[
+            float | None, typer.Option(help="The cap on the rate the import files are written at")
+        ] = None,
+
+        # Only if versioning is required
+        import_input_version: Annotated[str, typer.Option(callback=is_valid_input_version)] = 'V1',
+        import_output_version: Annotated[str, typer.Option(callback=is_valid_output_version)] = 'V1',
+):
+    """
+    Generate the journal entries for a batch of statements, resuming from where a previous run stopped.
+    """
+    result = run_batch(
+        statements=read_manifest(manifest_file),
+        checkpoint_path=checkpoint_file,
+        save_location=save_location,
+        max_workers=workers,
+        max_bytes_per_second=max_bytes_per_second,
         import_input_version=import_input_version,
         import_output_version=import_output_version,
     )
+    for identifier, error in result.failed.items():
+        typer.echo(f"{identifier}: {error}")
+
+    typer.echo(
+        f"{len(result.completed)} completed, {len(result.skipped)} skipped as already completed, "
+        f"{len(result.failed)} failed."
+    )
+    if result.failed:
+        raise typer.Exit(code=1)
@@ -237,4 +237,15 @@ OUTPUT_CONVERSION_MAP = {
     "V1": "placeholder"
 }
 
-ALLOWED_OUTPUT_VERSIONS = list(OUTPUT_CONVERSION_MAP.keys())
\ No newline at end of file
+ALLOWED_OUTPUT_VERSIONS = list(OUTPUT_CONVERSION_MAP.keys())
+
+# The statement columns the revenue lines are created from
+REVENUE_LINE_COLUMNS = [
+    'account number', 'posting date', 'document date', 'amount', 'description', 'department', 'market', 'state',
+    'division', 'client', 'entity',
+]
+
+# Revenue rows sharing all of these columns are collapsed into one line when summarizing
+DEFAULT_SUMMARY_KEYS = [
+    'entity', 'account number', 'posting date', 'document date', 'department', 'market', 'state', 'division', 'client',
+]
@@ -0,0 +1,131 @@
+"""Writing journal entries as the tab delimited V1 import file.
+
+The lines are formatted straight from the journal lines rather than through a DataFrame. Values that repeat on every
+line, like the dates and the enums, are formatted once and reused, and the rows are handed to the csv writer in large
+chunks. The output is the same, byte for byte, as `DataFrame.to_csv(sep='\\t', date_format='%m%d%y')` of
+`entries_to_dataframe()`, which is what the import files were written with before.
+"""
+import csv
+import io
+import math
+import os
+from collections.abc import Callable, Iterable
+from decimal import Decimal
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .main import JournalEntry
+
+DATE_FORMAT = '%m%d%y'
+CHUNK_SIZE = 10_000
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def write_import_file(
+        entries: Iterable['JournalEntry'],
+        destination: Path | io.BytesIO,
+        throttle: Callable[[int], None] | None = None,
+) -> int:
+    """Writes the entries' lines to the import file, or in-memory buffer.
+
+    :param throttle: Called with the size in bytes of each chunk before it is written, to hold the write back.
+    :return: The number of lines written.
+    """
+    if isinstance(destination, io.BytesIO):
+        f = io.TextIOWrapper(destination, encoding='utf-8', newline='')
+        try:
+            return write_import_lines(entries=entries, f=f, throttle=throttle)
+        finally:
+            f.flush()
+            f.detach()  # Leaves the buffer open for the caller
+
+    with open(destination, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE) as f:
+        return write_import_lines(entries=entries, f=f, throttle=throttle)
+
+
+def write_import_lines(
+        entries: Iterable['JournalEntry'], f: TextIO, throttle: Callable[[int], None] | None = None
+) -> int:
+    """Writes the entries' lines to the open text file in the V1 layout.
+
+    When throttled each chunk is formatted in memory first, so its size is known before it is written.
+
+    :return: The number of lines written.
+    """
+    chunk = io.StringIO() if throttle is not None else f
+    # The same dialect pandas uses for to_csv
+    writer = csv.writer(chunk, delimiter='\t', lineterminator=os.linesep, quoting=csv.QUOTE_MINIMAL)
+    formatter = _LineFormatter()
+    rows = list()
+    lines_written = 0
+
+    def write_rows() -> None:
+        writer.writerows(rows)
+        if throttle is not None:
+            text = chunk.getvalue()
+            chunk.seek(0)
+            chunk.truncate()
+            throttle(len(text.encode('utf-8')))
+            f.write(text)
+
+    for entry in entries:
+        for line in entry.lines:
+            rows.append(formatter.row(line))
+        if len(rows) >= CHUNK_SIZE:
+            write_rows()
+            lines_written += len(rows)
+            rows.clear()
+    write_rows()
+    return lines_written + len(rows)
+
+
+class _LineFormatter:
+    """Formats journal lines into rows of the import file, remembering the formatted dates and enums"""
+
+    def __init__(self):
+        self._dates: dict = dict()
+        self._enums: dict[Enum, str] = dict()
+
+    def row(self, line) -> tuple:
+        text = self.text
+        return (
+            text(line.account_type), text(line.account_number), self.date(line.posting_date),
+            self.date(line.document_date), text(line.blank_field), text(line.document_no), text(line.debit),
+            text(line.credit), text(line.description), text(line.department), text(line.market),
+            text(line.salesperson_code), text(line.state), text(line.customer), text(line.division),
+            text(line.client), text(line.employee_ID), text(line.business_unit_code), text(line.reason_code),
+            text(line.expense_code), text(line.vendor_dimension), text(line.job_dimension),
+            text(line.document_type), text(line.applies_to_document_type), text(line.applies_to_document_number),
+        )
+
+    def text(self, value):
+        """The value as to_csv writes it. The csv writer itself turns None into an empty field."""
+        if value.__class__ is str or value is None:
+            return value
+        if isinstance(value, Enum):
+            if (formatted := self._enums.get(value)) is None:
+                formatted = self._enums[value] = str(value)
+            return formatted
+        if isinstance(value, float):
+            return '' if math.isnan(value) else value
+        if isinstance(value, Decimal):
+            return '' if value.is_nan() else value
+        if value is pd.NA or value is pd.NaT:
+            return ''
+        return value
+
+    def date(self, value) -> str:
+        """The date formatted as the to_csv date_format of the datetime column, empty when missing"""
+        if value is None or value is pd.NaT or (value.__class__ is float and math.isnan(value)):
+            return ''
+        if (formatted := self._dates.get(value)) is None:
+            if hasattr(value, 'strftime'):
+                formatted = value.strftime(DATE_FORMAT)
+            else:
+                formatted = pd.Timestamp(value).strftime(DATE_FORMAT)
+            self._dates[value] = formatted
+        return formatted
@@ -1,3 +1,5 @@
+import io
+from collections.abc import Callable, Iterator
 from pathlib import Path
 from typing import Union
 
@@ -10,8 +12,12 @@ import uuid
 import pandas as pd
 
 from .constants import INTERCOMPANY_GL_ASSET_ACCOUNT, EntryType, DocumentType, \
-    INTERCOMPANY_GL_LIABILITY_ACCOUNT, Department, Market, ENTITIES, Entity
+    INTERCOMPANY_GL_LIABILITY_ACCOUNT, Department, Market, ENTITIES, Entity, REVENUE_LINE_COLUMNS
 from .exceptions import JournalEntryInvalid
+from .formatting import write_import_file
+from .observability import NULL_HOOKS, Hooks
+from .readers import load_statement, StatementRows
+from .summarize import summarize_revenue_rows
 
 SAVE_LOCATION = Path(__file__).parent  # Same folder as the script
 
@@ -30,36 +36,99 @@ def main(
         division: str,
         statement_identifier: str,
         save_location: Path = SAVE_LOCATION,
+        summarize_by: list[str] | None = None,
+        hooks: Hooks = NULL_HOOKS,
 
         # Only if versioning is required
         import_input_version: str = 'V1',
         import_output_version: str = 'V1',
 ):
-    df = pd.read_excel(import_file)
-    df.columns = df.columns.str.lower()  # Ensure all columns are lowercase to reduce mistakes
-    lines = df.to_dict(orient='records')
-
-    import_je = ImportEntries(
-        lines=lines,
-        posting_date=posting_date,
-        statement_reference=statement_identifier,
-        deposit_id=payment_number,
-        deposit_document_type=applies_to_type,
+    statement = Statement(
+        import_file=import_file,
+        client_code=client_code,
         deposit_entity=deposit_entity,
-        deposit_client_code=client_code,
-        import_version=import_input_version,
+        posting_date=posting_date,
         document_date=document_date,
-        deposit_department=department,
-        deposit_market=market,
-        deposit_state=state,
-        deposit_division=division,
+        payment_number=payment_number,
+        applies_to_type=applies_to_type,
+        department=department,
+        market=market,
+        state=state,
+        division=division,
+        statement_identifier=statement_identifier,
+        summarize_by=summarize_by,
     )
-    import_je.create()
-    save_import_jes(
-        entries=import_je,
+    try:
+        with hooks.span('statement', statement=statement_identifier):
+            import_je = statement.to_import_entries(import_version=import_input_version, hooks=hooks)
+            import_je.create()
+            save_import_jes(
+                entries=import_je,
+                save_location=save_location,
+                version=import_output_version,
+            )
+    finally:
+        # Failed runs are the ones most worth seeing, so the exporters are flushed either way
+        hooks.flush()
+
+
+def main_consolidated(
+        statements: list['Statement'],
+        batch_identifier: str,
+        save_location: Path = SAVE_LOCATION,
+        net_intercompany: bool = False,
+
+        # Only if versioning is required
+        import_input_version: str = 'V1',
+        import_output_version: str = 'V1',
+) -> Path:
+    """Generate the journal entries for many statements in one run.
+
+    Each statement keeps its own balanced journal entries, but instead of one directory per statement a single
+    directory is written holding one import file per entity per posting date. The document numbers include the
+    statement identifier, so every deposit is its own document in the shared files. Summarized statements get their
+    own summary detail file next to the import files.
+
+    With `net_intercompany` the intercompany lines of all the statements are netted to one settlement line per entity
+    pair. The gross balances behind the net lines are saved next to the import files as the audit trail.
+    """
+    # Imported here because the netting module builds on the classes in this module
+    from .netting import IntercompanyNetting
+
+    identifiers = [statement.statement_identifier for statement in statements]
+    duplicates = sorted({identifier for identifier in identifiers if identifiers.count(identifier) > 1})
+    if duplicates:
+        # The statement identifier keeps the deposits apart as documents, so duplicates would merge them
+        raise ValueError(f"Duplicate statement identifiers: {duplicates}")
+
+    imports = [statement.to_import_entries(import_version=import_input_version) for statement in statements]
+    for import_je in imports:
+        import_je.entry_id = import_je.create_entry_id(per_statement=True)
+
+    netting = None
+    if net_intercompany:
+        netting = IntercompanyNetting(imports=imports, batch_identifier=batch_identifier)
+        netting.create()
+        entries = netting.entries
+    else:
+        entries = list()
+        for import_je in imports:
+            import_je.create()
+            entries.extend(import_je.entries)
+
+    batch_save_location = save_consolidated_import_jes(
+        entries=entries,
+        batch_identifier=batch_identifier,
         save_location=save_location,
         version=import_output_version,
     )
+    for import_je in imports:
+        save_summary_detail(entries=import_je, save_location=batch_save_location, per_statement=True)
+    if netting is not None:
+        netting.audit_trail().to_csv(
+            batch_save_location / f'INTERCOMPANY AUDIT_{import_output_version}.txt', sep='\t', index=False,
+        )
+    return batch_save_location
 
 
 @define
@@ -202,16 +271,24 @@ class ImportEntries:
     _statement_amount: Decimal | None = None
     entry_id: str | None = None
     _entity_and_amount: dict | None = None
+    summary_detail: pd.DataFrame | None = None
+    statement_description: str | None = None
+    hooks: Hooks = field(default=NULL_HOOKS, repr=False)
 
     def __attrs_post_init__(self):
         """This function is ran after the object is created.
         It first validates the lines are for known entities.
-        Then creates the entry_id and an entity_and_amount metadata dictionary we will use later.
+        Then creates the entry_id and an entity_and_amount metadata dictionary we will use later, unless they were
+        given. The statement description defaults to the first line's description.
 
         :return: None
         """
-        self.entry_id = self.create_entry_id()
-        self._entity_and_amount = dict()
+        if self.entry_id is None:
+            self.entry_id = self.create_entry_id()
+        if self._entity_and_amount is None:
+            self._entity_and_amount = dict()
+        if self.statement_description is None and self.lines:
+            self.statement_description = self.lines[0]['description']
         for line in self.lines:
             if entity := ENTITIES.get(line.get('entity')):
                 line['entity'] = entity
@@ -220,21 +297,25 @@ class ImportEntries:
 
     def to_dataframe(self):
         """Turns the entries into a DataFrame that matches the general journal import V7 specification"""
-        lines = list()
+        with self.hooks.span('to_dataframe', statement=self.statement_reference):
+            return entries_to_dataframe(self.entries)
+
+    def to_buffers(self) -> dict[str, io.BytesIO]:
+        """The import file for each entity, keyed by the entity's abbreviation, as in-memory buffers.
+        The contents are the same as the files written by `save_import_jes`.
+        """
+        buffers = dict()
+        for entity, entries in entries_by_entity(self.entries).items():
+            buffer = io.BytesIO()
+            write_import_file(entries=entries, destination=buffer)
+            buffer.seek(0)
+            buffers[entity] = buffer
+        return buffers
+
+    def iter_lines(self) -> Iterator[JournalLine]:
+        """Yields the journal lines of every entry in order"""
         for entry in self.entries:
-            for line in entry.lines:
-                d = asdict(line)
-                d['entry_entity'] = line.entry_entity.abbreviation
-                lines.append(d)
-        df = pd.DataFrame(lines)
-        df['posting_date'] = pd.to_datetime(df['posting_date'])
-        df['document_date'] = pd.to_datetime(df['document_date'])
-        return df[[
-            'account_type', 'account_number', 'posting_date', 'document_date', 'blank_field', 'document_no', 'debit',
-            'credit', 'description', 'department', 'market', 'salesperson_code', 'state', 'customer', 'division',
-            'client', 'employee_ID', 'business_unit_code', 'reason_code', 'expense_code', 'vendor_dimension',
-            'job_dimension', 'document_type', 'applies_to_document_type', 'applies_to_document_number', 'entry_entity',
-        ]]
+            yield from entry.lines
 
     @property
     def statement_amount(self) -> Decimal:
@@ -256,7 +337,20 @@ class ImportEntries:
         | Make Intercompany Entries in other Entities | _Entry Entity_ : 12300 - Due to Related Entity | _Entry Entity_: 41000 - Commission |
         | Make Deposit Entry, Intercompany Entries to other Entities, and revenue entries | _Deposit Entity_ : P# - Client Card | _Deposit Entity_ : 22300 - Due from Related Entity  + _Entry Entity_ : 41000 - Commission |
         """
+        with self.hooks.span('create', statement=self.statement_reference):
+            self.create_intercompany_entries()
+            self.create_deposit_entity_entry()
+        self.hooks.metric('entities_touched', len(self.entities_and_amount), statement=self.statement_reference)
+        self.hooks.metric('entries_generated', len(self.entries), statement=self.statement_reference)
+
+    def create_intercompany_entries(self) -> None:
+        """Creates only the entries in the entities other than the deposit entity"""
         self._intercompany_entries_to_deposit_entity_jes()
+
+    def create_deposit_entity_entry(self) -> None:
+        """Creates only the deposit entity's entry. It uses the total of every entity, so the totals can be given
+        when the lines of the other entities are handled elsewhere, see `sharding`.
+        """
         self._deposit_entity_card_intercompany_and_revenue_je()
 
     def _intercompany_entries_to_deposit_entity_jes(self) -> None:
@@ -276,11 +370,7 @@ class ImportEntries:
         """
         description = f'Revenue entry in entities other than deposit entity intercompanying back to deposit entity: ' \
                       f'{self.deposit_entity.abbreviation}'
-        lines = [
-            self._revenue_line(line=line, entry_entity=entity)
-            for line in self.lines
-            if line['entity'] == entity
-        ]
+        lines = self._revenue_lines(entity=entity)
 
         lines.append(self._intercompany_line_to_deposit_entity(entity=entity, total_amount=entity_total_amount))
 
@@ -312,7 +402,7 @@ class ImportEntries:
                 # The below entry the balancing entry to the deposit entity.
                 # This is required so that each entity's journal entry nets to zero.
                 debit=Decimal(entities[entity]).quantize(Decimal('1.00')) * -1,
-                description=f"{entity.abbreviation} - {self.lines[0]['description']}",
+                description=f"{entity.abbreviation} - {self.statement_description}",
                 department=Department.corporate,
                 market=entity.major_market,
                 state=entity.major_state,
@@ -326,32 +416,10 @@ class ImportEntries:
             if entity != self.deposit_entity
         ]
         # Create deposit line in customer
-        deposit_line = [JournalLine(
-            account_type=EntryType.customer,
-            account_number=self.deposit_client_code,
-            posting_date=self.posting_date,
-            document_date=self.document_date,
-            document_no=self.entry_id,
-            debit=Decimal(self.statement_amount).quantize(Decimal('1.00')),
-            description=f"{self.lines[0]['description']}",
-            department=self.deposit_department,
-            market=self.deposit_market,
-            state=self.deposit_state,
-            division=self.deposit_division,
-            business_unit_code=self.deposit_entity.business_unit,
-            client=self.deposit_client_code,
-            applies_to_document_type=DocumentType.payment,
-            applies_to_document_number=self.deposit_id,
-            document_type=DocumentType.invoice,
-            entry_entity=self.deposit_entity,
-        )]
+        deposit_line = [self._deposit_line()]
 
         # Create revenue lines in the company
-        revenue_lines = [
-            self._revenue_line(line=line, entry_entity=self.deposit_entity)
-            for line in self.lines
-            if line['entity'] == self.deposit_entity
-        ]
+        revenue_lines = self._revenue_lines(entity=self.deposit_entity)
 
         # create description
         description = f'Created deposit line in {self.deposit_entity.abbreviation}'
@@ -373,6 +441,44 @@ class ImportEntries:
         if entry.is_valid:
             self.entries.append(entry)
 
+    def non_intercompany_lines(self, entity: Entity) -> list[JournalLine]:
+        """Creates the lines booked in the entity except the intercompany lines. For the deposit entity this is the
+        deposit line and its revenue lines, for every other entity it is only the revenue lines.
+        """
+        if entity == self.deposit_entity:
+            return [self._deposit_line()] + self._revenue_lines(entity=entity)
+        return self._revenue_lines(entity=entity)
+
+    def _deposit_line(self) -> JournalLine:
+        """Creates the deposit line in the customer sub-ledger of the deposit entity"""
+        return JournalLine(
+            account_type=EntryType.customer,
+            account_number=self.deposit_client_code,
+            posting_date=self.posting_date,
+            document_date=self.document_date,
+            document_no=self.entry_id,
+            debit=Decimal(self.statement_amount).quantize(Decimal('1.00')),
+            description=f"{self.statement_description}",
+            department=self.deposit_department,
+            market=self.deposit_market,
+            state=self.deposit_state,
+            division=self.deposit_division,
+            business_unit_code=self.deposit_entity.business_unit,
+            client=self.deposit_client_code,
+            applies_to_document_type=DocumentType.payment,
+            applies_to_document_number=self.deposit_id,
+            document_type=DocumentType.invoice,
+            entry_entity=self.deposit_entity,
+        )
+
+    def _revenue_lines(self, entity: Entity) -> list[JournalLine]:
+        """Creates the revenue lines booked in the entity"""
+        return [
+            self._revenue_line(line=line, entry_entity=entity)
+            for line in self.lines
+            if line['entity'] == entity
+        ]
+
     def _revenue_line(self, line: dict, entry_entity: Entity) -> JournalLine:
         """Creates revenue lines"""
         description = line['description']
@@ -407,7 +513,7 @@ class ImportEntries:
             document_no=self.entry_id,
             debit=total_amount,
             # Using the first lines description, line[0], is an imperfect workaround.
-            description=f"{entity.abbreviation} - {self.lines[0]['description']}",
+            description=f"{entity.abbreviation} - {self.statement_description}",
             client=self.deposit_client_code,
             document_type=DocumentType.invoice,
             department=Department.corporate,
@@ -418,8 +524,14 @@ class ImportEntries:
             entry_entity=entity,
         )
 
-    def create_entry_id(self) -> str:
-        return f"SJ{datetime.now().strftime('%Y%m%d')}{self.deposit_client_code}"
+    def create_entry_id(self, per_statement: bool = False) -> str:
+        """The document number of the entries. With `per_statement` the statement reference is added, so deposits
+        of the same client sharing an import file stay separate documents.
+        """
+        entry_id = f"SJ{datetime.now().strftime('%Y%m%d')}{self.deposit_client_code}"
+        if per_statement:
+            entry_id += f"-{self.statement_reference}"
+        return entry_id
 
     @property
     def entities_and_amount(self) -> dict:
@@ -436,30 +548,182 @@ class ImportEntries:
         return self._entity_and_amount
 
 
+@define
+class Statement:
+    """A statement together with the deposit parameters it is imported with.
+
+    The statement is normally a file, but it can also be rows already in memory.
+    """
+    import_file: Path | StatementRows
+    client_code: str
+    deposit_entity: Entity
+    posting_date: date
+    document_date: date
+    payment_number: str
+    applies_to_type: str
+    department: Department
+    market: Market
+    state: str
+    division: str
+    statement_identifier: str
+    summarize_by: list[str] | None = None
+
+    def to_import_entries(self, import_version: str = 'V1', hooks: Hooks = NULL_HOOKS) -> ImportEntries:
+        """Reads the statement and sets up the entries for the deposit.
+
+        When `summarize_by` is set the revenue rows that would post the same line are first collapsed to one row per
+        group, kept further apart by those columns.
+        """
+        with hooks.span('read_statement', statement=self.statement_identifier):
+            df = load_statement(self.import_file, columns=REVENUE_LINE_COLUMNS + (self.summarize_by or []))
+        hooks.metric('rows_read', len(df), statement=self.statement_identifier)
+        summary_detail = None
+        if self.summarize_by:
+            df, summary_detail = summarize_revenue_rows(df=df, keys=self.summarize_by)
+
+        return self.import_entries(
+            lines=df.to_dict(orient='records'),
+            import_version=import_version,
+            summary_detail=summary_detail,
+            hooks=hooks,
+        )
+
+    def import_entries(self, lines: list[dict], import_version: str = 'V1', **kwargs) -> ImportEntries:
+        """Sets up the entries for the deposit from lines that are already read.
+        Any other `ImportEntries` argument can be passed as a keyword argument.
+        """
+        return ImportEntries(
+            lines=lines,
+            posting_date=self.posting_date,
+            statement_reference=self.statement_identifier,
+            deposit_id=self.payment_number,
+            deposit_document_type=self.applies_to_type,
+            deposit_entity=self.deposit_entity,
+            deposit_client_code=self.client_code,
+            import_version=import_version,
+            document_date=self.document_date,
+            deposit_department=self.department,
+            deposit_market=self.market,
+            deposit_state=self.state,
+            deposit_division=self.division,
+            **kwargs,
+        )
+
+
+def entries_to_dataframe(entries: list[JournalEntry]) -> pd.DataFrame:
+    """Turns the entries into a DataFrame that matches the general journal import V7 specification"""
+    lines = list()
+    for entry in entries:
+        for line in entry.lines:
+            d = asdict(line)
+            d['entry_entity'] = line.entry_entity.abbreviation
+            lines.append(d)
+    df = pd.DataFrame(lines)
+    df['posting_date'] = pd.to_datetime(df['posting_date'])
+    df['document_date'] = pd.to_datetime(df['document_date'])
+    return df[[
+        'account_type', 'account_number', 'posting_date', 'document_date', 'blank_field', 'document_no', 'debit',
+        'credit', 'description', 'department', 'market', 'salesperson_code', 'state', 'customer', 'division',
+        'client', 'employee_ID', 'business_unit_code', 'reason_code', 'expense_code', 'vendor_dimension',
+        'job_dimension', 'document_type', 'applies_to_document_type', 'applies_to_document_number', 'entry_entity',
+    ]]
+
+
 def save_import_jes(
         entries: ImportEntries,
         save_location: Path,
         version: str,
+        throttle: Callable[[int], None] | None = None,
 ) -> Path:
     """
     Using the list of entries from the entries attribute. A dataframe of the entries are created. Looking at each
     entities set of entries they are saved off as a .txt file to the specified location.
+
+    The optional `throttle` is called with the size of each chunk of an import file before it is written, see
+    `write_import_file`.
     """
     # TODO: Implement support for Quickbooks
     # TODO: Implement support for SAP
     # TODO: Implement support for Oracle Fusion
 
-    df = entries.to_dataframe()
+    hooks = entries.hooks
     statement_save_location = save_location / f'{entries.statement_reference}'
-    statement_save_location.mkdir()
-    for entity in df['entry_entity'].unique():
-        destination = statement_save_location / f"{entries.posting_date.strftime('%m.%d.%y')} " \
-                                                f"{entries.document_date.strftime('%m.%y')} " \
-                                                f"CK {entries.deposit_id} " \
-                                                f"IMPORT_{entries.import_version}_{entity}.txt"
-        df[df['entry_entity'] == entity].drop('entry_entity', axis=1) \
-            .to_csv(destination, sep='\t', index=False, header=False, date_format='%m%d%y', )
+    lines_written = 0
+    with hooks.span('save_import_jes', statement=entries.statement_reference):
+        statement_save_location.mkdir()
+        with hooks.span('format_import_files', statement=entries.statement_reference):
+            for entity, entity_entries in entries_by_entity(entries.entries).items():
+                destination = statement_save_location / import_file_name(entries=entries, entity=entity)
+                lines_written += write_import_file(
+                    entries=entity_entries, destination=destination, throttle=throttle,
+                )
+    hooks.metric('lines_written', lines_written, statement=entries.statement_reference)
+    if hooks.enabled:
+        bytes_written = sum(file_.stat().st_size for file_ in statement_save_location.iterdir())
+        hooks.metric('bytes_written', bytes_written, statement=entries.statement_reference)
+
+    save_summary_detail(entries=entries, save_location=statement_save_location)
 
     # TODO: zip the files
     return statement_save_location
 
+
+def save_summary_detail(entries: ImportEntries, save_location: Path, per_statement: bool = False) -> None:
+    """Saves the source rows behind the summarized revenue lines of the statement, if it was summarized.
+
+    With `per_statement` the statement reference is added to the file name, so statements sharing a payment number
+    in the same directory keep their own detail file.
+    """
+    if entries.summary_detail is None:
+        return
+    deposit = entries.deposit_id
+    if per_statement:
+        deposit += f"-{entries.statement_reference}"
+    destination = save_location / f"{entries.posting_date.strftime('%m.%d.%y')} " \
+                                  f"{entries.document_date.strftime('%m.%y')} " \
+                                  f"CK {deposit} " \
+                                  f"SUMMARY DETAIL_{entries.import_version}.txt"
+    entries.summary_detail.to_csv(destination, sep='\t', index=False, date_format='%m%d%y')
+
+
+def import_file_name(entries: ImportEntries, entity: str) -> str:
+    """The name of the import file holding the entity's entries of the statement"""
+    return f"{entries.posting_date.strftime('%m.%d.%y')} " \
+           f"{entries.document_date.strftime('%m.%y')} " \
+           f"CK {entries.deposit_id} " \
+           f"IMPORT_{entries.import_version}_{entity}.txt"
+
+
+def save_consolidated_import_jes(
+        entries: list[JournalEntry],
+        batch_identifier: str,
+        save_location: Path,
+        version: str,
+) -> Path:
+    """
+    Saves the entries of many statements into a single directory. Entries are grouped by posting date and entity so
+    there is one .txt file per entity per posting date holding every deposit's entries.
+    """
+    batch_save_location = save_location / f'{batch_identifier}'
+    batch_save_location.mkdir()
+
+    grouped_entries: dict[tuple[date, str], list[JournalEntry]] = dict()
+    for entry in entries:
+        key = (entry.posting_date, entry.lines[0].entry_entity.abbreviation)
+        grouped_entries.setdefault(key, []).append(entry)
+
+    for (posting_date, entity), group in grouped_entries.items():
+        destination = batch_save_location / f"{posting_date.strftime('%m.%d.%y')} " \
+                                            f"CONSOLIDATED IMPORT_{version}_{entity}.txt"
+        write_import_file(entries=group, destination=destination)
+
+    return batch_save_location
+
+
+def entries_by_entity(entries: list[JournalEntry]) -> dict[str, list[JournalEntry]]:
+    """Groups the entries by the abbreviation of their entity, which is what each import file holds"""
+    grouped_entries: dict[str, list[JournalEntry]] = dict()
+    for entry in entries:
+        grouped_entries.setdefault(entry.lines[0].entry_entity.abbreviation, []).append(entry)
+    return grouped_entries
+
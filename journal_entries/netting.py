@@ -0,0 +1,170 @@
+"""Intercompany netting across a batch of statements.
+
+Every statement books an intercompany pair (12300 in the revenue entity, 22300 in the deposit entity) for each
+non-deposit entity. Across a batch the same entity pairs get many offsetting pairs. This module aggregates those
+balances per entity pair and replaces them with a single net settlement line per pair.
+"""
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+from attrs import define, field
+
+from .constants import INTERCOMPANY_GL_ASSET_ACCOUNT, INTERCOMPANY_GL_LIABILITY_ACCOUNT, Department, DocumentType, \
+    Entity, EntryType
+from .main import ImportEntries, JournalEntry, JournalLine
+
+
+@define(frozen=True)
+class IntercompanySource:
+    """A gross intercompany balance from a single statement. Kept as the audit trail of the net lines.
+
+    The amount is the balance the entity is due from the counterparty, the deposit entity of the statement.
+    """
+    posting_date: date
+    entity: Entity
+    counterparty: Entity
+    statement_reference: str
+    deposit_id: str
+    client: str
+    amount: Decimal
+
+
+@define
+class IntercompanyNetting:
+    """Nets the intercompany balances of a batch of statements.
+
+    For each posting date the result is one journal entry per entity holding the deposit and revenue lines of every
+    statement plus one net settlement line per counterparty entity. Each entry nets to zero because every
+    statement's lines in an entity net to zero with its intercompany lines, and the net line is their sum.
+
+    The netted entries are posted under a document number derived from the batch identifier, unless one is given.
+    """
+    imports: list[ImportEntries]
+    batch_identifier: str
+    document_no: str | None = None
+
+    entries: list[JournalEntry] = field(factory=list)
+    sources: list[IntercompanySource] = field(factory=list)
+    _balances: dict[tuple[date, Entity, Entity], Decimal] = field(factory=dict)
+
+    def __attrs_post_init__(self):
+        if self.document_no is None:
+            self.document_no = f"IC{self.batch_identifier}"
+
+    def create(self) -> None:
+        """Aggregates the intercompany balances and creates the netted journal entries"""
+        self._aggregate_balances()
+        self._netted_entity_jes()
+
+    def _aggregate_balances(self) -> None:
+        """Single pass over the statements adding each intercompany balance to its entity pair.
+
+        The pair is keyed with the lower business unit first and the balance is what the first entity is due from
+        the second, so balances flowing in opposite directions offset each other.
+        """
+        for import_je in self.imports:
+            deposit_entity = import_je.deposit_entity
+            for entity, amount in import_je.entities_and_amount.items():
+                if entity == deposit_entity:
+                    continue
+                amount = amount.quantize(Decimal('1.00'))
+                self.sources.append(IntercompanySource(
+                    posting_date=import_je.posting_date,
+                    entity=entity,
+                    counterparty=deposit_entity,
+                    statement_reference=import_je.statement_reference,
+                    deposit_id=import_je.deposit_id,
+                    client=import_je.deposit_client_code,
+                    amount=amount,
+                ))
+                if entity.business_unit < deposit_entity.business_unit:
+                    key = (import_je.posting_date, entity, deposit_entity)
+                else:
+                    key = (import_je.posting_date, deposit_entity, entity)
+                    amount = amount * -1
+                self._balances[key] = self._balances.get(key, Decimal(0)) + amount
+
+    def _netted_entity_jes(self) -> None:
+        """Creates one journal entry per posting date and entity with the net settlement lines"""
+        entity_lines: dict[tuple[date, Entity], list[JournalLine]] = dict()
+        for import_je in self.imports:
+            for entity in import_je.entities_and_amount.keys():
+                key = (import_je.posting_date, entity)
+                entity_lines.setdefault(key, []).extend(import_je.non_intercompany_lines(entity=entity))
+            # The deposit entity always has the deposit line even without revenue of its own
+            if import_je.deposit_entity not in import_je.entities_and_amount:
+                key = (import_je.posting_date, import_je.deposit_entity)
+                entity_lines.setdefault(key, []).extend(
+                    import_je.non_intercompany_lines(entity=import_je.deposit_entity)
+                )
+
+        for (posting_date, entity, counterparty), amount in self._balances.items():
+            if amount == 0:
+                continue
+            entity_lines[(posting_date, entity)].append(
+                self._net_settlement_line(
+                    posting_date=posting_date, entity=entity, counterparty=counterparty, amount=amount
+                )
+            )
+            entity_lines[(posting_date, counterparty)].append(
+                self._net_settlement_line(
+                    posting_date=posting_date, entity=counterparty, counterparty=entity, amount=amount * -1
+                )
+            )
+
+        for (posting_date, entity), lines in entity_lines.items():
+            # The lines of many deposits are now one entry, so they need to share a document number.
+            for line in lines:
+                line.document_no = self.document_no
+            entry = JournalEntry(
+                lines=lines,
+                description=f'Netted intercompany entry in {entity.abbreviation}',
+                posting_date=posting_date,
+                identifier=self.document_no,
+            )
+            if entry.is_valid:
+                self.entries.append(entry)
+
+    def _net_settlement_line(
+            self, posting_date: date, entity: Entity, counterparty: Entity, amount: Decimal
+    ) -> JournalLine:
+        """Creates the net settlement line in the entity. A positive amount is due from the counterparty."""
+        return JournalLine(
+            account_type=EntryType.general_ledger,
+            account_number=INTERCOMPANY_GL_ASSET_ACCOUNT if amount > 0 else INTERCOMPANY_GL_LIABILITY_ACCOUNT,
+            posting_date=posting_date,
+            document_date=posting_date,
+            document_no=self.document_no,
+            debit=amount,
+            description=f"{entity.abbreviation} - Net intercompany with {counterparty.abbreviation} "
+                        f"{counterparty.business_unit}",
+            department=Department.corporate,
+            market=counterparty.major_market,
+            state=counterparty.major_state,
+            division=counterparty.major_division,
+            business_unit_code=counterparty.business_unit,
+            document_type=DocumentType.invoice,
+            entry_entity=entity,
+        )
+
+    def audit_trail(self) -> pd.DataFrame:
+        """The gross intercompany balances behind each net line, one row per statement and entity pair"""
+        return pd.DataFrame([
+            {
+                'posting_date': source.posting_date,
+                'document_no': self.document_no,
+                'entity': source.entity.abbreviation,
+                'entity_business_unit': source.entity.business_unit,
+                'counterparty': source.counterparty.abbreviation,
+                'counterparty_business_unit': source.counterparty.business_unit,
+                'statement_reference': source.statement_reference,
+                'deposit_id': source.deposit_id,
+                'client': source.client,
+                'amount': source.amount,
+            }
+            for source in self.sources
+        ], columns=[
+            'posting_date', 'document_no', 'entity', 'entity_business_unit', 'counterparty',
+            'counterparty_business_unit', 'statement_reference', 'deposit_id', 'client', 'amount',
+        ])
@@ -0,0 +1,150 @@
+"""Metrics and tracing hooks for the statement pipeline.
+
+`main()` and `ImportEntries` report spans, the time taken by a stage, and metrics, counts like the rows read, to a
+`Hooks` object. The stages of a statement are `read_statement`, `create`, `format_import_files`, the time spent
+formatting and writing the import files, `save_import_jes`, which includes it, and `statement` for the whole run.
+`ImportEntries.to_dataframe()` is its own `to_dataframe` stage when it is called.
+
+The default `NULL_HOOKS` does nothing and skips any work done only to measure, so there is no cost when it is not
+used. Two exporters write locally: `JsonLinesExporter` appends one JSON object per event, and
+`PrometheusTextfileExporter` writes the latest values for the node exporter's textfile collector.
+"""
+import json
+import os
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+from attrs import define, field
+
+
+class Hooks:
+    """Receives the spans and metrics of the pipeline. Every method does nothing, override the ones needed."""
+    enabled = True
+
+    def span(self, name: str, **labels):
+        """Times the code in the `with` block and reports it to `on_span`"""
+        return _Span(hooks=self, name=name, labels=labels)
+
+    def on_span(self, name: str, duration_seconds: float, labels: dict, failed: bool) -> None:
+        pass
+
+    def metric(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class NullHooks(Hooks):
+    """Hooks that are turned off"""
+    enabled = False
+
+    def span(self, name: str, **labels):
+        return _NULL_SPAN
+
+
+NULL_HOOKS = NullHooks()
+_NULL_SPAN = nullcontext()
+
+
+@define
+class _Span:
+    hooks: Hooks
+    name: str
+    labels: dict
+    _start: float | None = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.hooks.on_span(
+            name=self.name,
+            duration_seconds=time.perf_counter() - self._start,
+            labels=self.labels,
+            failed=exc_type is not None,
+        )
+
+
+@define
+class MultiHooks(Hooks):
+    """Sends every span and metric to each of the hooks"""
+    hooks: list[Hooks]
+
+    def on_span(self, name: str, duration_seconds: float, labels: dict, failed: bool) -> None:
+        for hooks in self.hooks:
+            hooks.on_span(name=name, duration_seconds=duration_seconds, labels=labels, failed=failed)
+
+    def metric(self, name: str, value: float, **labels) -> None:
+        for hooks in self.hooks:
+            hooks.metric(name, value, **labels)
+
+    def flush(self) -> None:
+        for hooks in self.hooks:
+            hooks.flush()
+
+
+@define
+class JsonLinesExporter(Hooks):
+    """Appends every span and metric to the file as a JSON object on its own line"""
+    path: Path
+
+    def on_span(self, name: str, duration_seconds: float, labels: dict, failed: bool) -> None:
+        self._write({
+            'type': 'span', 'name': name, 'duration_seconds': duration_seconds, 'failed': failed, 'labels': labels,
+        })
+
+    def metric(self, name: str, value: float, **labels) -> None:
+        self._write({'type': 'metric', 'name': name, 'value': value, 'labels': labels})
+
+    def _write(self, event: dict) -> None:
+        event['timestamp'] = time.time()
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event, default=str) + '\n')
+
+
+@define
+class PrometheusTextfileExporter(Hooks):
+    """Keeps the latest value of every metric and span duration, and writes them in the Prometheus text format.
+    Whether each stage failed is kept as `stage_failed`, 1 when it raised.
+
+    The file is replaced in one step on `flush` so the textfile collector never reads a partly written file.
+    """
+    path: Path
+    prefix: str = 'journal_entries'
+    _values: dict[tuple[str, tuple], float] = field(factory=dict)
+
+    def on_span(self, name: str, duration_seconds: float, labels: dict, failed: bool) -> None:
+        label_key = self._label_key(stage=name, **labels)
+        self._values[('stage_duration_seconds', label_key)] = duration_seconds
+        self._values[('stage_failed', label_key)] = int(failed)
+
+    def metric(self, name: str, value: float, **labels) -> None:
+        self._values[(name, self._label_key(**labels))] = value
+
+    def flush(self) -> None:
+        lines = list()
+        for metric_name in sorted({name for name, _ in self._values}):
+            lines.append(f'# TYPE {self.prefix}_{metric_name} gauge')
+            for (name, labels), value in self._values.items():
+                if name == metric_name:
+                    lines.append(f'{self.prefix}_{name}{self._format_labels(labels)} {value}')
+
+        temporary_path = Path(f'{self.path}.{os.getpid()}.tmp')
+        temporary_path.write_text('\n'.join(lines) + '\n')
+        os.replace(temporary_path, self.path)
+
+    @staticmethod
+    def _label_key(**labels) -> tuple:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ''
+        escaped = (
+            (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels
+        )
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
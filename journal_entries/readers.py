@@ -0,0 +1,149 @@
+"""Reading statements into a DataFrame.
+
+Statements can be Excel workbooks, comma or tab delimited text files, or Parquet files. The format is picked from the
+file extension, or from the start of the file when the extension is not known. Parquet files need pyarrow, installed
+with the `parquet` extra. When it is installed delimited files are also read with the pyarrow CSV reader.
+
+Statements already in memory, as a DataFrame, an Arrow table or rows of dictionaries, are used as they are.
+"""
+from collections.abc import Iterable
+from importlib.util import find_spec
+from os import PathLike
+from pathlib import Path
+
+import pandas as pd
+
+from .constants import REVENUE_LINE_COLUMNS
+
+EXCEL = 'excel'
+CSV = 'csv'
+TSV = 'tsv'
+PARQUET = 'parquet'
+
+FILE_FORMATS = {
+    '.xlsx': EXCEL, '.xlsm': EXCEL, '.xls': EXCEL,
+    '.csv': CSV,
+    '.tsv': TSV, '.tab': TSV,
+    '.parquet': PARQUET, '.pq': PARQUET,
+}
+
+# Delimited files have no types, so the columns are read as they would be used rather than guessed
+DELIMITED_DTYPES = {
+    'account number': 'str', 'amount': 'float64', 'description': 'str', 'department': 'str', 'market': 'str',
+    'state': 'str', 'division': 'str', 'client': 'str', 'entity': 'str',
+}
+DATE_COLUMNS = ['posting date', 'document date']
+
+# An in-memory statement: a DataFrame, an Arrow table or any iterable of row dictionaries
+StatementRows = pd.DataFrame | Iterable[dict]
+
+
+def load_statement(
+        source: Path | StatementRows, columns: list[str] | None = REVENUE_LINE_COLUMNS
+) -> pd.DataFrame:
+    """Loads the statement from a file path or from rows already in memory. See `read_statement` for the columns."""
+    if isinstance(source, (str, PathLike)):
+        return read_statement(source, columns=columns)
+    return statement_from_rows(source, columns=columns)
+
+
+def statement_from_rows(rows: StatementRows, columns: list[str] | None = REVENUE_LINE_COLUMNS) -> pd.DataFrame:
+    """Turns an in-memory statement into a DataFrame with lowercase column names."""
+    if isinstance(rows, pd.DataFrame):
+        df = rows.copy()
+    elif hasattr(rows, 'to_pandas'):  # An Arrow table, without needing pyarrow to be installed
+        df = rows.to_pandas()
+    else:
+        df = pd.DataFrame(list(rows))
+
+    df.columns = df.columns.str.lower()  # Ensure all columns are lowercase to reduce mistakes
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
+    return df
+
+
+def read_statement(
+        import_file: Path, columns: list[str] | None = REVENUE_LINE_COLUMNS, typed: bool = True
+) -> pd.DataFrame:
+    """Reads the statement file into a DataFrame with lowercase column names.
+
+    :param import_file: The statement file.
+    :param columns: The lowercase names of the columns to read, all the columns are read when None. Columns missing
+        from the file are left out rather than raising, so they can be reported by the caller.
+    :param typed: Whether delimited files are read with the `DELIMITED_DTYPES` and parsed dates. When False their
+        values are left as text, so a bad value can be reported with its row instead of failing the whole read.
+    """
+    file_format = statement_file_format(import_file)
+    if columns is None:
+        use_column = None
+    else:
+        wanted = set(columns)
+
+        def use_column(name: str) -> bool:
+            return str(name).lower() in wanted
+
+    if file_format == PARQUET:
+        df = _read_parquet(import_file, use_column=use_column)
+    elif file_format in (CSV, TSV):
+        df = _read_delimited(
+            import_file, sep='\t' if file_format == TSV else ',', use_column=use_column, typed=typed,
+        )
+    else:
+        df = pd.read_excel(import_file, usecols=use_column)
+
+    df.columns = df.columns.str.lower()  # Ensure all columns are lowercase to reduce mistakes
+    return df
+
+
+def statement_file_format(import_file: Path) -> str:
+    """Works out the statement's format from its extension, or its first bytes when the extension is unknown"""
+    if file_format := FILE_FORMATS.get(Path(import_file).suffix.lower()):
+        return file_format
+
+    with open(import_file, 'rb') as f:
+        start = f.read(4096)
+    if start.startswith(b'PAR1'):
+        return PARQUET
+    if start.startswith(b'PK\x03\x04') or start.startswith(b'\xd0\xcf\x11\xe0'):
+        return EXCEL
+    first_line = start.split(b'\n', 1)[0]
+    return TSV if first_line.count(b'\t') > first_line.count(b',') else CSV
+
+
+def _read_delimited(import_file: Path, sep: str, use_column, typed: bool = True) -> pd.DataFrame:
+    header = pd.read_csv(import_file, sep=sep, nrows=0).columns
+    names = [name for name in header if use_column is None or use_column(name)]
+    if typed:
+        dtype = {name: DELIMITED_DTYPES[name.lower()] for name in names if name.lower() in DELIMITED_DTYPES}
+    else:
+        dtype = str
+    df = pd.read_csv(
+        import_file,
+        sep=sep,
+        usecols=names,
+        dtype=dtype,
+        engine='pyarrow' if find_spec('pyarrow') else 'c',
+    )
+    if not typed:
+        return df
+    for name in names:
+        if name.lower() in DATE_COLUMNS:
+            try:
+                df[name] = pd.to_datetime(df[name])
+            except (ValueError, TypeError):
+                pass  # Left as text so the invalid dates can be found by validation
+    return df
+
+
+def _read_parquet(import_file: Path, use_column) -> pd.DataFrame:
+    if find_spec('pyarrow') is None:
+        raise ImportError(
+            f"Reading the Parquet statement {import_file} needs pyarrow. Install it with the parquet extra: "
+            f"poetry install --extras parquet, or pip install 'journal-entries[parquet]'"
+        )
+    import pyarrow.parquet as pq  # Optional dependency, see the parquet extra
+
+    columns = None
+    if use_column is not None:
+        columns = [name for name in pq.read_schema(import_file).names if use_column(name)]
+    return pd.read_parquet(import_file, columns=columns)
@@ -0,0 +1,164 @@
+"""Creating the entries of a single large statement on many cores.
+
+The entries of the entities other than the deposit entity only depend on their own rows, so the rows are split by
+the import file they end up in and each split is turned into entries, and written, in its own worker process. The
+deposit entity's entry only needs the total of each entity, which the workers send back.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+from attrs import define, evolve
+
+from .constants import ENTITIES, REVENUE_LINE_COLUMNS, Department, Entity, Market
+from .formatting import write_import_file
+from .main import SAVE_LOCATION, Statement, import_file_name
+from .readers import StatementRows, load_statement
+
+
+@define
+class EntityShard:
+    """The rows of the entities sharing an import file, and what is needed to create their entries.
+
+    The statement only carries the deposit parameters, its `import_file` is None, so a worker is sent its own rows
+    and not the whole statement.
+    """
+    statement: Statement
+    rows: pd.DataFrame
+    entry_id: str
+    statement_description: str
+    import_version: str
+    statement_save_location: Path
+
+
+@define
+class ShardTotals:
+    """What the deposit entity's entry needs from a shard"""
+    entities_and_amount: dict[Entity, Decimal]
+    statement_amount: Decimal
+
+
+def main_sharded(
+        import_file: Path | StatementRows,
+        client_code: str,
+        deposit_entity: Entity,
+        posting_date: date,
+        document_date: date,
+        payment_number: str,
+        applies_to_type: str,
+        department: Department,
+        market: Market,
+        state: str,
+        division: str,
+        statement_identifier: str,
+        save_location: Path = SAVE_LOCATION,
+        max_workers: int | None = None,
+
+        # Only if versioning is required
+        import_input_version: str = 'V1',
+) -> Path:
+    """Generates the same import files as `main()`, creating the entries of each import file in a worker process.
+
+    :return: The directory the import files are saved in.
+    """
+    statement = Statement(
+        import_file=import_file,
+        client_code=client_code,
+        deposit_entity=deposit_entity,
+        posting_date=posting_date,
+        document_date=document_date,
+        payment_number=payment_number,
+        applies_to_type=applies_to_type,
+        department=department,
+        market=market,
+        state=state,
+        division=division,
+        statement_identifier=statement_identifier,
+    )
+    df = load_statement(import_file, columns=REVENUE_LINE_COLUMNS)
+    unknown_entities = df.loc[~df['entity'].isin(ENTITIES.keys()), 'entity']
+    if not unknown_entities.empty:
+        raise ValueError(f"Unknown Entity: {unknown_entities.iloc[0]}")
+
+    # The deposit entity's import file is made here, with the entities sharing its abbreviation
+    abbreviations = df['entity'].map({code: entity.abbreviation for code, entity in ENTITIES.items()})
+    deposit_rows = df[abbreviations == deposit_entity.abbreviation]
+    deposit_import_je = statement.import_entries(
+        lines=deposit_rows.to_dict(orient='records'),
+        import_version=import_input_version,
+        statement_description=df['description'].iloc[0],
+    )
+
+    statement_save_location = save_location / f'{statement_identifier}'
+    statement_save_location.mkdir()
+
+    deposit_parameters = evolve(statement, import_file=None)
+    shards = [
+        EntityShard(
+            statement=deposit_parameters,
+            rows=rows,
+            entry_id=deposit_import_je.entry_id,
+            statement_description=deposit_import_je.statement_description,
+            import_version=import_input_version,
+            statement_save_location=statement_save_location,
+        )
+        for abbreviation, rows in df.groupby(abbreviations, sort=False)
+        if abbreviation != deposit_entity.abbreviation
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        shard_totals = list(executor.map(create_shard, shards))
+
+    deposit_import_je.create_intercompany_entries()
+    shard_totals.append(ShardTotals(
+        entities_and_amount=deposit_import_je.entities_and_amount,
+        statement_amount=deposit_import_je.statement_amount,
+    ))
+
+    # The deposit entity's entry lists the entities in the order they are first found in the statement
+    totals = dict()
+    for shard in shard_totals:
+        totals.update(shard.entities_and_amount)
+    entities_and_amount = {ENTITIES[code]: totals[ENTITIES[code]] for code in df['entity'].unique()}
+
+    deposit_entry_import_je = statement.import_entries(
+        lines=deposit_rows.to_dict(orient='records'),
+        import_version=import_input_version,
+        entry_id=deposit_import_je.entry_id,
+        statement_description=deposit_import_je.statement_description,
+        entity_and_amount=entities_and_amount,
+        statement_amount=sum((shard.statement_amount for shard in shard_totals), Decimal(0)),
+    )
+    deposit_entry_import_je.create_deposit_entity_entry()
+
+    entries = deposit_import_je.entries + deposit_entry_import_je.entries
+    write_import_file(
+        entries=entries,
+        destination=statement_save_location / import_file_name(
+            entries=deposit_import_je, entity=deposit_entity.abbreviation
+        ),
+    )
+    return statement_save_location
+
+
+def create_shard(shard: EntityShard) -> ShardTotals:
+    """Creates and saves the entries of the shard's entities. Runs in a worker process."""
+    import_je = shard.statement.import_entries(
+        lines=shard.rows.to_dict(orient='records'),
+        import_version=shard.import_version,
+        entry_id=shard.entry_id,
+        statement_description=shard.statement_description,
+    )
+    import_je.create_intercompany_entries()
+
+    entity = import_je.entries[0].lines[0].entry_entity.abbreviation
+    write_import_file(
+        entries=import_je.entries,
+        destination=shard.statement_save_location / import_file_name(entries=import_je, entity=entity),
+    )
+    return ShardTotals(
+        entities_and_amount=import_je.entities_and_amount,
+        statement_amount=import_je.statement_amount,
+    )
+
@@ -0,0 +1,46 @@
+"""Summarizing the revenue rows of a statement before the journal lines are created.
+
+Large statements have thousands of rows sharing the same account and dimensions. Posting them as one line per group
+keeps the import small, and the detail of which source rows make up each line is kept alongside it.
+"""
+import pandas as pd
+
+from .constants import DEFAULT_SUMMARY_KEYS, REVENUE_LINE_COLUMNS
+
+# Every column posted on the revenue lines, so rows are only collapsed when their lines would be the same
+REQUIRED_SUMMARY_KEYS = [column for column in REVENUE_LINE_COLUMNS if column not in ('amount', 'description')]
+
+
+def summarize_revenue_rows(
+        df: pd.DataFrame,
+        keys: list[str] = DEFAULT_SUMMARY_KEYS,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Collapses the revenue rows into one row per group of the key columns.
+
+    The columns posted on the revenue lines, the entity, account, dates and dimensions, are always part of the key,
+    so a summary line never loses a dimension of its source rows. Other columns can be added to the key to keep
+    rows apart. The amounts are rounded to cents before they are summed, so the summary adds up to the same
+    statement total as the detail rows. The description is taken from the first row of the group.
+
+    :return: The summary rows and the detail rows. Both have a `summary line` column linking a source row, identified
+        by its `source row` spreadsheet row number, to the summary row it is part of.
+    """
+    keys = [key for key in REQUIRED_SUMMARY_KEYS if key not in keys] + list(keys)
+    missing_columns = [key for key in keys if key not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Unknown summary columns: {missing_columns}")
+
+    detail = df.copy()
+    detail['amount'] = detail['amount'].round(2)
+    # The header is the first spreadsheet row, so the first data row is row 2.
+    detail.insert(0, 'source row', detail.index + 2)
+    detail.insert(0, 'summary line', detail.groupby(keys, dropna=False, sort=False).ngroup() + 1)
+
+    summary = detail.groupby('summary line', sort=False).agg(
+        **{key: (key, 'first') for key in keys},
+        amount=('amount', 'sum'),
+        description=('description', 'first'),
+    ).reset_index()
+    summary['amount'] = summary['amount'].round(2)
+
+    return summary, detail
@@ -0,0 +1,151 @@
+"""Pre-flight checks for statement files.
+
+The checks find the problems that would stop the import, like unknown entities or bad dates, without creating any
+journal lines or writing any files. Every check works on whole columns at once, and many files are checked in
+parallel so hundreds of statements can be checked before month end.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+from attrs import define
+
+from .constants import ENTITIES, REVENUE_LINE_COLUMNS
+from .readers import DATE_COLUMNS, read_statement
+
+
+@define(frozen=True)
+class ValidationIssue:
+    """A problem found in a statement file. The row is the spreadsheet row number, the header being row 1."""
+    file: Path
+    message: str
+    row: int | None = None
+    column: str | None = None
+
+    def __str__(self):
+        location = str(self.file)
+        if self.row is not None:
+            location += f':{self.row}'
+        if self.column is not None:
+            location += f' [{self.column}]'
+        return f'{location}: {self.message}'
+
+
+def validate_statements(import_files: list[Path], max_workers: int | None = None) -> list[ValidationIssue]:
+    """Validates many statement files, in parallel worker processes unless `max_workers` is 1."""
+    if max_workers == 1 or len(import_files) <= 1:
+        results = [validate_statement(import_file) for import_file in import_files]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(validate_statement, import_files))
+    return [issue for issues in results for issue in issues]
+
+
+def validate_statement(import_file: Path) -> list[ValidationIssue]:
+    """Validates a single statement file and returns every issue found."""
+    try:
+        # Read as text, so the values the import could not use are found by the checks below with their rows
+        df = read_statement(import_file, typed=False)
+    except Exception as e:  # Any file that cannot be read is an issue to report, not a reason to stop
+        return [ValidationIssue(file=import_file, message=f'Unable to read the statement: {e}')]
+
+    missing_columns = [column for column in REVENUE_LINE_COLUMNS if column not in df.columns]
+    issues = [
+        ValidationIssue(file=import_file, column=column, message='Missing required column')
+        for column in missing_columns
+    ]
+    if df.empty:
+        issues.append(ValidationIssue(file=import_file, message='The statement has no rows'))
+        return issues
+
+    # The header is the first spreadsheet row, so the first data row is row 2.
+    rows = pd.Series(df.index + 2, index=df.index)
+
+    if 'entity' in df.columns:
+        unknown = ~df['entity'].isin(ENTITIES.keys())
+        issues += _row_issues(import_file, rows[unknown], 'entity', df.loc[unknown, 'entity'], 'Unknown Entity: {}')
+
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            dates = pd.to_datetime(df[column], errors='coerce')
+            missing = df[column].isna()
+            invalid = dates.isna() & ~missing
+            issues += _row_issues(import_file, rows[missing], column, df.loc[missing, column], 'Missing date')
+            issues += _row_issues(import_file, rows[invalid], column, df.loc[invalid, column], 'Invalid date: {}')
+
+    if 'posting date' in df.columns:
+        issues += _posting_date_mismatches(import_file, df, rows)
+
+    if 'amount' in df.columns:
+        amounts = pd.to_numeric(df['amount'], errors='coerce')
+        invalid = amounts.isna()
+        issues += _row_issues(import_file, rows[invalid], 'amount', df.loc[invalid, 'amount'], 'Invalid amount: {}')
+        if 'entity' in df.columns:
+            issues += _entity_imbalances(import_file, df['entity'][~invalid], amounts[~invalid], rows[~invalid])
+
+    return issues
+
+
+def _row_issues(
+        import_file: Path, rows: pd.Series, column: str, values: pd.Series, message: str
+) -> list[ValidationIssue]:
+    return [
+        ValidationIssue(file=import_file, row=int(row), column=column, message=message.format(value))
+        for row, value in zip(rows, values)
+    ]
+
+
+def _posting_date_mismatches(import_file: Path, df: pd.DataFrame, rows: pd.Series) -> list[ValidationIssue]:
+    """Finds the rows whose posting date differs from the rest of the statement.
+
+    All the lines of a journal entry need the same posting date, and every entry holds a line at the deposit's
+    posting date, so the rows of each entity, and of the statement as a whole, have to share one posting date. The
+    statement's posting date is taken to be the most common one.
+    """
+    dates = pd.to_datetime(df['posting date'], errors='coerce')
+    if dates.notna().sum() == 0:
+        return []
+    statement_date = dates.mode().iloc[0]
+    differs = dates.notna() & (dates != statement_date)
+    entities = df['entity'] if 'entity' in df.columns else pd.Series(None, index=df.index)
+    return [
+        ValidationIssue(
+            file=import_file,
+            row=int(row),
+            column='posting date',
+            message=f'Posting date {date:%Y-%m-%d} of entity {entity} does not match the statement posting date '
+                    f'{statement_date:%Y-%m-%d}',
+        )
+        for row, date, entity in zip(rows[differs], dates[differs], entities[differs])
+    ]
+
+
+def _entity_imbalances(
+        import_file: Path, entities: pd.Series, amounts: pd.Series, rows: pd.Series
+) -> list[ValidationIssue]:
+    """Finds the entities whose journal entries would not net to zero.
+
+    The revenue lines are rounded to cents one at a time, while the entity total used for the intercompany line is
+    rounded as it is added up. The two can only differ when an amount is exactly half a cent, so only the entities
+    with such amounts are added up again the way `ImportEntries` does it.
+    """
+    half_cent = (amounts * 100 % 1) == 0.5
+
+    issues = list()
+    for entity in entities[half_cent].unique():
+        in_entity = entities == entity
+        entity_total = Decimal(0)
+        lines_total = Decimal(0)
+        for amount in amounts[in_entity]:
+            entity_total = Decimal(entity_total + Decimal(amount)).quantize(Decimal('1.00'))
+            lines_total += Decimal(amount).quantize(Decimal('1.00'))
+        if entity_total != lines_total:
+            issues.append(ValidationIssue(
+                file=import_file,
+                column='amount',
+                message=f'Entity {entity} does not net to zero: its lines total {lines_total} but the entity total '
+                        f'is {entity_total}. Rows with half cent amounts: '
+                        f'{", ".join(str(row) for row in rows[in_entity & half_cent])}',
+            ))
+    return issues
@@ -0,0 +1,50 @@
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from journal_entries.api import generate_entries
+from journal_entries.constants import Department, Division, Market, e16
+from journal_entries.main import main
+
+test_data_directory = Path(__file__).parent / "data"
+
+deposit = dict(
+    client_code='P005',
+    deposit_entity=e16,
+    posting_date=pd.Timestamp(date(2024, 9, 17)),
+    document_date=pd.Timestamp(date(2024, 1, 31)),
+    payment_number='191705',
+    applies_to_type='Payment',
+    department=Department.retail,
+    market=Market.corporate,
+    state='ALL',
+    division=Division.six,
+    statement_identifier='8495543',
+)
+
+
+@pytest.mark.parametrize('to_rows', [
+    lambda df: df,
+    lambda df: df.to_dict(orient='records'),
+    lambda df: iter(df.to_dict(orient='records')),
+    lambda df: pytest.importorskip('pyarrow').Table.from_pandas(df),
+])
+def test_generating_entries_in_memory_matches_the_saved_imports(tmp_path, to_rows):
+    # GIVEN the statement rows already in memory
+    df = pd.read_excel(test_data_directory / 'example-statement.xlsx')
+
+    # WHEN generating the entries in memory and saving the same statement from its file
+    entries = generate_entries(rows=to_rows(df), **deposit)
+    main(import_file=test_data_directory / 'example-statement.xlsx', save_location=tmp_path, **deposit)
+
+    # THEN the entity buffers match the saved files byte for byte
+    buffers = entries.to_buffers()
+    saved_files = {file_.name.split('_')[-1].removesuffix('.txt'): file_ for file_ in (tmp_path / '8495543').iterdir()}
+    assert buffers.keys() == saved_files.keys()
+    for entity, buffer in buffers.items():
+        assert buffer.read() == saved_files[entity].read_bytes()
+
+    # THEN the lines and the DataFrame hold every line
+    assert len(list(entries.iter_lines())) == len(entries.to_dataframe()) == 52 + 1 + 17 * 2
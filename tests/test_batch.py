@@ -0,0 +1,135 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from journal_entries.batch import CheckpointJournal, read_manifest, run_batch
+from journal_entries.constants import Department, Division, Market, e16
+
+test_data_directory = Path(__file__).parent / "data"
+
+
+def write_manifest(tmp_path, statements: dict[str, Path]) -> Path:
+    manifest_file = tmp_path / 'manifest.csv'
+    pd.DataFrame([
+        dict(
+            import_file=import_file,
+            client_code='P005',
+            deposit_entity='E16',
+            posting_date='2024-09-17',
+            document_date='2024-01-31',
+            payment_number='191705',
+            applies_to_type='Payment',
+            department='retail',
+            market='corporate',
+            state='ALL',
+            division='6',
+            statement_identifier=identifier,
+        )
+        for identifier, import_file in statements.items()
+    ]).to_csv(manifest_file, index=False)
+    return manifest_file
+
+
+def test_read_manifest(tmp_path):
+    # GIVEN a manifest with a statement path relative to the manifest
+    manifest_file = write_manifest(tmp_path, {'8495543': Path('example-statement.xlsx')})
+
+    # WHEN reading it
+    statement, = read_manifest(manifest_file)
+
+    # THEN the fields are converted to the statement's types
+    assert statement.import_file == tmp_path / 'example-statement.xlsx'
+    assert statement.deposit_entity == e16
+    assert statement.posting_date == pd.Timestamp(date(2024, 9, 17))
+    assert statement.department == Department.retail
+    assert statement.market == Market.corporate
+    assert statement.division == Division.six
+
+
+def test_batch_resumes_from_the_checkpoint_journal(tmp_path):
+    # GIVEN a batch with a good statement, a statement whose file is missing and a statement the previous run died
+    # partway through
+    save_location = tmp_path / 'imports'
+    save_location.mkdir()
+    checkpoint_path = tmp_path / 'checkpoint.jsonl'
+    example = test_data_directory / 'example-statement.xlsx'
+    statements = read_manifest(write_manifest(tmp_path, {
+        'good': example, 'missing': tmp_path / 'missing.xlsx', 'interrupted': example,
+    }))
+    (save_location / 'interrupted').mkdir()
+    (save_location / 'interrupted' / 'partial.txt').write_text('half an import file')
+    with open(checkpoint_path, 'w') as f:
+        f.write(json.dumps(dict(
+            statement_identifier='interrupted', state='started', output_path=str(save_location / 'interrupted'),
+        )) + '\n')
+
+    # WHEN running the batch
+    result = run_batch(statements, checkpoint_path=checkpoint_path, save_location=save_location, max_workers=2)
+
+    # THEN the bad statement fails without stopping the others, and the partial output is replaced
+    assert sorted(result.completed) == ['good', 'interrupted']
+    assert list(result.failed) == ['missing']
+    assert not (save_location / 'missing').exists()
+    assert not (save_location / 'interrupted' / 'partial.txt').exists()
+    assert sorted(file_.name for file_ in (save_location / 'interrupted').iterdir()) == \
+        sorted(file_.name for file_ in (save_location / 'good').iterdir())
+
+    # GIVEN one of the completed outputs is then changed
+    changed = next((save_location / 'interrupted').iterdir())
+    changed.write_text(changed.read_text() + 'changed')
+
+    # WHEN running the batch again
+    result = run_batch(statements, checkpoint_path=checkpoint_path, save_location=save_location)
+
+    # THEN the verified statement is skipped and the others are run again
+    assert result.skipped == ['good']
+    assert result.completed == ['interrupted']
+    assert list(result.failed) == ['missing']
+    assert 'changed' not in changed.read_text()
+    records = CheckpointJournal(path=checkpoint_path).load()
+    assert {identifier: record.state for identifier, record in records.items()} == \
+        {'good': 'completed', 'interrupted': 'completed', 'missing': 'failed'}
+
+
+def test_batch_never_removes_output_it_did_not_write(tmp_path):
+    # GIVEN the output of a statement already exists but was not written by the batch
+    save_location = tmp_path / 'imports'
+    (save_location / 'good').mkdir(parents=True)
+    (save_location / 'good' / 'precious.txt').write_text('keep me')
+    checkpoint_path = tmp_path / 'checkpoint.jsonl'
+    statements = read_manifest(write_manifest(tmp_path, {'good': test_data_directory / 'example-statement.xlsx'}))
+
+    # WHEN running the batch twice
+    results = [
+        run_batch(statements, checkpoint_path=checkpoint_path, save_location=save_location) for _ in range(2)
+    ]
+
+    # THEN the statement fails both times and the output is left alone
+    assert [list(result.failed) for result in results] == [['good'], ['good']]
+    assert (save_location / 'good' / 'precious.txt').read_text() == 'keep me'
+
+
+def test_batch_write_rate_is_limited_before_writing(tmp_path, monkeypatch):
+    # GIVEN waiting is recorded instead of slept
+    waits = []
+    monkeypatch.setattr('journal_entries.batch.time.sleep', waits.append)
+    save_location = tmp_path / 'imports'
+    save_location.mkdir()
+    statements = read_manifest(write_manifest(tmp_path, {'good': test_data_directory / 'example-statement.xlsx'}))
+
+    # WHEN running the batch with a write rate of 1 kB a second
+    result = run_batch(
+        statements, checkpoint_path=tmp_path / 'checkpoint.jsonl', save_location=save_location,
+        max_bytes_per_second=1000,
+    )
+
+    # THEN every import file waited for the ones written before it
+    import_files = list((save_location / 'good').iterdir())
+    assert result.completed == ['good']
+    assert len(waits) == len(import_files)
+    assert waits[0] == pytest.approx(0, abs=0.1)
+    total_bytes = sum(file_.stat().st_size for file_ in import_files)
+    assert waits[-1] == pytest.approx(total_bytes / 1000, abs=max(file_.stat().st_size for file_ in import_files))
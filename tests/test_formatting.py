@@ -0,0 +1,71 @@
+import io
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from journal_entries.api import generate_entries
+from journal_entries.constants import Department, Division, Market, e16
+from journal_entries.formatting import write_import_file
+from journal_entries.main import entries_by_entity, entries_to_dataframe
+
+test_data_directory = Path(__file__).parent / "data"
+
+
+def to_csv_import_file(entries) -> bytes:
+    """How the import files were written before the dedicated formatter"""
+    buffer = io.BytesIO()
+    entries_to_dataframe(entries).drop('entry_entity', axis=1) \
+        .to_csv(buffer, sep='\t', index=False, header=False, date_format='%m%d%y', )
+    return buffer.getvalue()
+
+
+def awkward_statement(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df['Description'] = df['Description'].astype(object)
+    df.loc[0, 'Description'] = 'Has a\ttab and "quotes"'
+    df.loc[1, 'Description'] = 'Has a\nnew line'
+    df['Client'] = df['Client'].astype(object)
+    df.loc[2, 'Client'] = np.nan
+    df['Account Number'] = df['Account Number'].astype(float)
+    df.loc[3, 'Amount'] = 0.0
+    df.loc[4, 'Amount'] = -12.5
+    return df
+
+
+@pytest.mark.parametrize('throttled', [False, True])
+@pytest.mark.parametrize('prepare', [lambda df: df, awkward_statement])
+def test_import_file_matches_to_csv_byte_for_byte(prepare, throttled):
+    # GIVEN the entries of a statement
+    entries = generate_entries(
+        rows=prepare(pd.read_excel(test_data_directory / 'example-statement.xlsx')),
+        client_code='P005',
+        deposit_entity=e16,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='8495543',
+    )
+
+    # WHEN writing each entity's import file
+    for entity, entity_entries in entries_by_entity(entries.entries).items():
+        buffer = io.BytesIO()
+        throttled_bytes = []
+        lines_written = write_import_file(
+            entries=entity_entries, destination=buffer, throttle=throttled_bytes.append if throttled else None,
+        )
+
+        # THEN it is the same as to_csv
+        assert buffer.getvalue() == to_csv_import_file(entity_entries)
+        assert lines_written == sum(len(entry.lines) for entry in entity_entries)
+
+        # THEN a throttled write is held back by every byte before it is written
+        if throttled:
+            assert sum(throttled_bytes) == len(buffer.getvalue())
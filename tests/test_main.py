@@ -2,9 +2,11 @@ from datetime import date
 from pathlib import Path
 
 import pandas as pd
+import pytest
 
-from journal_entries.constants import Market, Division, e16, Department
-from journal_entries.main import main
+from journal_entries.constants import Market, Division, e16, e4, Department
+from journal_entries.main import main, main_consolidated, Statement
+from journal_entries.readers import read_statement
 
 test_data_directory = Path(__file__).parent / "data"
 
@@ -86,3 +88,274 @@ G/L Account\t22300\t091724\t013124\t\tSJ20240507P005\t-608.88\t0\tMS - Quasar In
 """ # noqa
 
 
+
+
+def test_consolidating_many_statements_into_one_import_per_entity(tmp_path):
+    # GIVEN two deposits for the same posting date in different deposit entities
+    test_file = test_data_directory / 'example-statement.xlsx'
+    statements = [
+        Statement(
+            import_file=test_file,
+            client_code='P005',
+            deposit_entity=deposit_entity,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number=payment_number,
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier=payment_number,
+            summarize_by=summarize_by,
+        )
+        for deposit_entity, payment_number, summarize_by in [(e16, '191705', None), (e4, '191706', ['customer'])]
+    ]
+
+    # WHEN consolidating the statements, one of them summarized
+    batch_location = main_consolidated(
+        statements=statements,
+        batch_identifier='batch-1',
+        save_location=tmp_path,
+    )
+
+    # THEN there is a single directory with one file per entity for the posting date
+    assert list(tmp_path.iterdir()) == [batch_location]
+    files = list(batch_location.glob('*CONSOLIDATED*'))
+    assert len(files) == 16
+    assert all(file_.name.startswith('09.17.24 CONSOLIDATED IMPORT_V1_') for file_ in files)
+
+    # THEN both deposits are in their deposit entity's files and every file nets to zero
+    ff_file = batch_location / '09.17.24 CONSOLIDATED IMPORT_V1_FF.txt'
+    iv_file = batch_location / '09.17.24 CONSOLIDATED IMPORT_V1_IV.txt'
+    assert 'Payment\t191705' in ff_file.read_text()
+    assert 'Payment\t191706' in iv_file.read_text()
+    for file_ in files:
+        df = pd.read_csv(file_, sep='\t', header=None)
+        assert round(df[6].sum() - df[7].sum(), 2) == 0
+
+    # THEN each deposit in a shared file is its own document that nets to zero
+    ns = pd.read_csv(batch_location / '09.17.24 CONSOLIDATED IMPORT_V1_NS.txt', sep='\t', header=None)
+    assert sorted(ns[5].str.rsplit('-', n=1).str[1].unique()) == ['191705', '191706']
+    assert ns[5].str.rsplit('-', n=1).str[0].nunique() == 1
+    for _, document in ns.groupby(5):
+        assert round(document[6].sum() - document[7].sum(), 2) == 0
+
+    # THEN the summarized statement's lines can be traced back to its rows
+    assert sorted(file_.name for file_ in batch_location.glob('*SUMMARY DETAIL*')) == \
+        ['09.17.24 01.24 CK 191706-191706 SUMMARY DETAIL_V1.txt']
+    detail = pd.read_csv(batch_location / '09.17.24 01.24 CK 191706-191706 SUMMARY DETAIL_V1.txt', sep='\t')
+    assert detail['source row'].tolist() == list(range(2, 54))
+
+
+def test_consolidating_summarized_statements_sharing_a_payment_number(tmp_path):
+    # GIVEN two summarized statements paid with the same check
+    df = pd.read_excel(test_data_directory / 'example-statement.xlsx')
+    statements = [
+        Statement(
+            import_file=rows,
+            client_code='P005',
+            deposit_entity=e16,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number='191705',
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier=statement_identifier,
+            summarize_by=['customer'],
+        )
+        for statement_identifier, rows in [('8495543', df.head(20)), ('8495544', df.tail(32))]
+    ]
+
+    # WHEN consolidating the statements
+    batch_location = main_consolidated(statements=statements, batch_identifier='batch-1', save_location=tmp_path)
+
+    # THEN each statement keeps its own summary detail file
+    assert sorted(file_.name for file_ in batch_location.glob('*SUMMARY DETAIL*')) == [
+        '09.17.24 01.24 CK 191705-8495543 SUMMARY DETAIL_V1.txt',
+        '09.17.24 01.24 CK 191705-8495544 SUMMARY DETAIL_V1.txt',
+    ]
+    first = pd.read_csv(batch_location / '09.17.24 01.24 CK 191705-8495543 SUMMARY DETAIL_V1.txt', sep='\t')
+    second = pd.read_csv(batch_location / '09.17.24 01.24 CK 191705-8495544 SUMMARY DETAIL_V1.txt', sep='\t')
+    assert (len(first), len(second)) == (20, 32)
+
+
+def test_consolidating_rejects_duplicate_statement_identifiers(tmp_path):
+    # GIVEN two deposits with the same statement identifier
+    statements = [
+        Statement(
+            import_file=test_data_directory / 'example-statement.xlsx',
+            client_code='P005',
+            deposit_entity=deposit_entity,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number=payment_number,
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier='8495543',
+        )
+        for deposit_entity, payment_number in [(e16, '191705'), (e4, '191706')]
+    ]
+
+    # WHEN consolidating the statements
+    # THEN they are rejected before anything is written
+    with pytest.raises(ValueError, match=r"Duplicate statement identifiers: \['8495543'\]"):
+        main_consolidated(statements=statements, batch_identifier='batch-1', save_location=tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_consolidating_with_intercompany_netting(tmp_path):
+    # GIVEN two deposits whose entities are due from each other
+    test_file = test_data_directory / 'example-statement.xlsx'
+    statements = [
+        Statement(
+            import_file=test_file,
+            client_code='P005',
+            deposit_entity=deposit_entity,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number=payment_number,
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier=payment_number,
+        )
+        for deposit_entity, payment_number in [(e16, '191705'), (e4, '191706')]
+    ]
+
+    # WHEN consolidating the statements with netting
+    batch_location = main_consolidated(
+        statements=statements,
+        batch_identifier='batch-1',
+        save_location=tmp_path,
+        net_intercompany=True,
+    )
+
+    # THEN the IV and FF intercompany balances are netted to a single line on each side
+    iv = pd.read_csv(batch_location / '09.17.24 CONSOLIDATED IMPORT_V1_IV.txt', sep='\t', header=None, dtype=str)
+    ff = pd.read_csv(batch_location / '09.17.24 CONSOLIDATED IMPORT_V1_FF.txt', sep='\t', header=None, dtype=str)
+    assert iv[iv[8].str.contains('Net intercompany with FF')][[1, 6]].values.tolist() == [['12300', '11908.01']]
+    assert ff[ff[8].str.contains('Net intercompany with IV')][[1, 6]].values.tolist() == [['22300', '-11908.01']]
+
+    # THEN every entity still nets to zero
+    for file_ in batch_location.glob('*CONSOLIDATED*'):
+        df = pd.read_csv(file_, sep='\t', header=None)
+        assert round(df[6].sum() - df[7].sum(), 2) == 0
+
+    # THEN the gross balances are kept in the audit trail
+    audit = pd.read_csv(batch_location / 'INTERCOMPANY AUDIT_V1.txt', sep='\t', dtype={'deposit_id': str})
+    assert sorted(audit[audit['entity'] == 'IV']['deposit_id'].tolist()) == ['191705']
+    assert audit['document_no'].unique().tolist() == ['ICbatch-1']
+    assert iv[5].unique().tolist() == ['ICbatch-1']
+    assert audit[(audit['entity'] == 'FF') & (audit['counterparty'] == 'IV')]['amount'].tolist() == [1102.93]
+
+
+def test_summarizing_revenue_lines(tmp_path):
+    # GIVEN a statement where every row is repeated
+    df = pd.read_excel(test_data_directory / 'example-statement.xlsx')
+    import_file = tmp_path / 'statement.csv'
+    pd.concat([df, df], ignore_index=True).to_csv(import_file, index=False)
+    save_location = tmp_path / 'imports'
+    save_location.mkdir()
+
+    # WHEN summarizing by account number
+    main(
+        import_file=import_file,
+        client_code='P005',
+        deposit_entity=e16,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='8495543',
+        save_location=save_location,
+        summarize_by=['account number'],
+    )
+    statement_location = save_location / '8495543'
+
+    # THEN the repeated rows are one revenue line per market, keeping its dimensions
+    iv = pd.read_csv(
+        statement_location / '09.17.24 01.24 CK 191705 IMPORT_V1_IV.txt', sep='\t', header=None, dtype=str,
+        keep_default_na=False,
+    )
+    revenue = iv[iv[1] == '41000']
+    assert len(revenue) == 14
+    assert revenue[revenue[10] == 'BIRMING'][[6, 9, 12, 14, 15]].values.tolist() == \
+        [['-1436.46', 'RETAIL', 'AL', '4', 'P008']]
+    assert (revenue[[9, 10, 12, 14, 15]] != '').all().all()
+    assert round(revenue[6].astype(float).sum(), 2) == -26021.88
+
+    # THEN the detail file maps every source row to its summary line
+    detail = pd.read_csv(statement_location / '09.17.24 01.24 CK 191705 SUMMARY DETAIL_V1.txt', sep='\t')
+    assert len(detail) == 104
+    assert detail['source row'].tolist() == list(range(2, 106))
+    assert detail['summary line'].tolist() == list(range(1, 53)) * 2
+
+
+@pytest.mark.parametrize('file_name, write', [
+    ('statement.csv', lambda df, path: df.to_csv(path, index=False)),
+    ('statement.tsv', lambda df, path: df.to_csv(path, sep='\t', index=False)),
+    ('statement.txt', lambda df, path: df.to_csv(path, sep='\t', index=False)),
+    ('statement.parquet', lambda df, path: df.to_parquet(path, index=False)),
+    ('statement', lambda df, path: df.to_parquet(path, index=False)),
+])
+def test_creating_import_from_other_statement_formats(tmp_path, file_name, write):
+    if not file_name.endswith(('.csv', '.tsv', '.txt')):
+        pytest.importorskip('pyarrow')
+
+    # GIVEN the example statement saved in another format
+    import_file = tmp_path / file_name
+    write(pd.read_excel(test_data_directory / 'example-statement.xlsx'), import_file)
+
+    # WHEN creating the imports from the Excel statement and the converted statement
+    created_files = []
+    for statement_file, save_location in [
+        (test_data_directory / 'example-statement.xlsx', tmp_path / 'excel'),
+        (import_file, tmp_path / 'converted'),
+    ]:
+        save_location.mkdir()
+        main(
+            import_file=statement_file,
+            client_code='P005',
+            deposit_entity=e16,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number='191705',
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier='8495543',
+            save_location=save_location,
+        )
+        created_files.append({
+            file_.name: file_.read_text() for file_ in (save_location / '8495543').iterdir()
+        })
+
+    # THEN the imports are the same
+    assert created_files[0] == created_files[1]
+
+
+def test_reading_parquet_without_pyarrow_explains_the_extra(tmp_path, monkeypatch):
+    # GIVEN pyarrow is not installed
+    monkeypatch.setattr('journal_entries.readers.find_spec', lambda name: None)
+    import_file = tmp_path / 'statement.parquet'
+    import_file.write_bytes(b'PAR1')
+
+    # WHEN reading a Parquet statement
+    # THEN the error says how to install it
+    with pytest.raises(ImportError, match='parquet extra'):
+        read_statement(import_file)
@@ -0,0 +1,88 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from journal_entries.constants import Department, Division, Market, e16
+from journal_entries.main import main
+from journal_entries.observability import JsonLinesExporter, MultiHooks, PrometheusTextfileExporter
+
+test_data_directory = Path(__file__).parent / "data"
+
+
+def test_statement_metrics_are_exported(tmp_path):
+    # GIVEN both exporters
+    jsonl_path = tmp_path / 'metrics.jsonl'
+    prometheus_path = tmp_path / 'journal_entries.prom'
+    hooks = MultiHooks(hooks=[JsonLinesExporter(path=jsonl_path), PrometheusTextfileExporter(path=prometheus_path)])
+    save_location = tmp_path / 'downloads'
+    save_location.mkdir()
+
+    # WHEN creating the imports
+    main(
+        import_file=test_data_directory / 'example-statement.xlsx',
+        client_code='P005',
+        deposit_entity=e16,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='8495543',
+        save_location=save_location,
+        hooks=hooks,
+    )
+
+    # THEN every stage and count is in the JSON lines file
+    events = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert [event['name'] for event in events if event['type'] == 'span'] == [
+        'read_statement', 'create', 'format_import_files', 'save_import_jes', 'statement',
+    ]
+    metrics = {event['name']: event['value'] for event in events if event['type'] == 'metric'}
+    bytes_written = sum(file_.stat().st_size for file_ in (save_location / '8495543').iterdir())
+    assert metrics == {
+        'rows_read': 52, 'entities_touched': 18, 'entries_generated': 18, 'lines_written': 87,
+        'bytes_written': bytes_written,
+    }
+    assert all(event['labels']['statement'] == '8495543' for event in events)
+
+    # THEN the Prometheus textfile has the latest values
+    prometheus = prometheus_path.read_text()
+    assert '# TYPE journal_entries_rows_read gauge\njournal_entries_rows_read{statement="8495543"} 52\n' in prometheus
+    assert 'journal_entries_stage_duration_seconds{stage="create",statement="8495543"} ' in prometheus
+    assert 'journal_entries_stage_duration_seconds{stage="format_import_files",statement="8495543"} ' in prometheus
+    assert 'journal_entries_stage_failed{stage="statement",statement="8495543"} 0\n' in prometheus
+
+
+def test_failed_statement_metrics_are_exported(tmp_path):
+    # GIVEN a statement file that does not exist
+    prometheus_path = tmp_path / 'journal_entries.prom'
+
+    # WHEN creating the imports fails
+    with pytest.raises(FileNotFoundError):
+        main(
+            import_file=tmp_path / 'missing.xlsx',
+            client_code='P005',
+            deposit_entity=e16,
+            posting_date=pd.Timestamp(date(2024, 9, 17)),
+            document_date=pd.Timestamp(date(2024, 1, 31)),
+            payment_number='191705',
+            applies_to_type='Payment',
+            department=Department.retail,
+            market=Market.corporate,
+            state='ALL',
+            division=Division.six,
+            statement_identifier='8495543',
+            save_location=tmp_path,
+            hooks=PrometheusTextfileExporter(path=prometheus_path),
+        )
+
+    # THEN the failure is still written to the Prometheus textfile
+    prometheus = prometheus_path.read_text()
+    assert 'journal_entries_stage_failed{stage="read_statement",statement="8495543"} 1\n' in prometheus
+    assert 'journal_entries_stage_failed{stage="statement",statement="8495543"} 1\n' in prometheus
@@ -0,0 +1,71 @@
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from journal_entries.constants import Department, Division, Market, e1, e16
+from journal_entries.main import main
+from journal_entries.sharding import main_sharded
+
+test_data_directory = Path(__file__).parent / "data"
+
+
+# e1 shares its NS abbreviation, and so its import file, with two other entities
+@pytest.mark.parametrize('deposit_entity', [e16, e1])
+def test_sharded_imports_match_the_single_process_imports(tmp_path, deposit_entity):
+    # GIVEN the deposit
+    deposit = dict(
+        import_file=test_data_directory / 'example-statement.xlsx',
+        client_code='P005',
+        deposit_entity=deposit_entity,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='8495543',
+    )
+    (tmp_path / 'single').mkdir()
+    (tmp_path / 'sharded').mkdir()
+
+    # WHEN creating the imports in one process and sharded over worker processes
+    main(save_location=tmp_path / 'single', **deposit)
+    main_sharded(save_location=tmp_path / 'sharded', max_workers=2, **deposit)
+
+    # THEN the import files are the same
+    single = {file_.name: file_.read_text() for file_ in (tmp_path / 'single' / '8495543').iterdir()}
+    sharded = {file_.name: file_.read_text() for file_ in (tmp_path / 'sharded' / '8495543').iterdir()}
+    assert sharded == single
+
+
+def test_sharding_an_in_memory_statement(tmp_path):
+    # GIVEN the statement rows are already in memory
+    rows = pd.read_excel(test_data_directory / 'example-statement.xlsx')
+    deposit = dict(
+        client_code='P005',
+        deposit_entity=e16,
+        posting_date=pd.Timestamp(date(2024, 9, 17)),
+        document_date=pd.Timestamp(date(2024, 1, 31)),
+        payment_number='191705',
+        applies_to_type='Payment',
+        department=Department.retail,
+        market=Market.corporate,
+        state='ALL',
+        division=Division.six,
+        statement_identifier='8495543',
+    )
+    (tmp_path / 'single').mkdir()
+    (tmp_path / 'sharded').mkdir()
+
+    # WHEN creating the imports from the file in one process and from the rows sharded over worker processes
+    main(import_file=test_data_directory / 'example-statement.xlsx', save_location=tmp_path / 'single', **deposit)
+    main_sharded(import_file=rows, save_location=tmp_path / 'sharded', max_workers=2, **deposit)
+
+    # THEN the import files are the same
+    single = {file_.name: file_.read_text() for file_ in (tmp_path / 'single' / '8495543').iterdir()}
+    sharded = {file_.name: file_.read_text() for file_ in (tmp_path / 'sharded' / '8495543').iterdir()}
+    assert sharded == single
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from journal_entries.cli import app
+from journal_entries.validation import validate_statement, validate_statements
+
+test_data_directory = Path(__file__).parent / "data"
+
+
+def test_validating_a_good_statement():
+    # WHEN validating the example statement
+    issues = validate_statement(test_data_directory / 'example-statement.xlsx')
+
+    # THEN there are no issues
+    assert issues == []
+
+
+@pytest.mark.parametrize('file_name, write', [
+    ('bad-statement.xlsx', lambda df, path: df.to_excel(path, index=False)),
+    ('bad-statement.csv', lambda df, path: df.to_csv(path, index=False)),
+])
+def test_validating_finds_row_level_issues(tmp_path, file_name, write):
+    # GIVEN a statement with an unknown entity, a bad date, a different posting date, a bad amount, a half cent amount
+    # and a missing column
+    df = pd.read_excel(test_data_directory / 'example-statement.xlsx')
+    df.loc[3, 'Entity'] = 'E99'
+    df['Posting Date'] = df['Posting Date'].astype(object)
+    df.loc[5, 'Posting Date'] = 'not a date'
+    df.loc[8, 'Posting Date'] = pd.Timestamp('2024-09-18')
+    df['Amount'] = df['Amount'].astype(object)
+    df.loc[1, 'Amount'] = 285.125
+    df.loc[4, 'Amount'] = 'abc'
+    df = df.drop(columns=['Client'])
+    bad_file = tmp_path / file_name
+    write(df, bad_file)
+
+    # WHEN validating the statements
+    issues = validate_statements([test_data_directory / 'example-statement.xlsx', bad_file], max_workers=2)
+
+    # THEN every issue is reported against the bad file with its location
+    assert {issue.file for issue in issues} == {bad_file}
+    assert [(issue.row, issue.column) for issue in issues if issue.row is not None] == [
+        (5, 'entity'), (7, 'posting date'), (10, 'posting date'), (6, 'amount'),
+    ]
+    messages = [str(issue) for issue in issues]
+    assert f'{bad_file} [client]: Missing required column' in messages
+    assert f'{bad_file}:5 [entity]: Unknown Entity: E99' in messages
+    assert f'{bad_file}:6 [amount]: Invalid amount: abc' in messages
+    assert f'{bad_file}:10 [posting date]: Posting date 2024-09-18 of entity E4 does not match the statement ' \
+           f'posting date 2024-09-17' in messages
+    assert f'{bad_file} [amount]: Entity E4 does not net to zero: its lines total 13010.39 but the entity total is ' \
+           f'13010.40. Rows with half cent amounts: 3' in messages
+
+
+def test_validate_command_exits_with_an_error_when_there_are_issues(tmp_path):
+    # GIVEN a file that is not a statement
+    bad_file = tmp_path / 'statement.xlsx'
+    bad_file.write_text('not a spreadsheet')
+
+    # WHEN running the validate command
+    result = CliRunner().invoke(app, ['validate', str(test_data_directory / 'example-statement.xlsx'), str(bad_file)])
+
+    # THEN the issue is reported and the command fails
+    assert result.exit_code == 1
+    assert 'Unable to read the statement' in result.output
+    assert '1 issue(s) found in 1 of 2 statement(s).' in result.output